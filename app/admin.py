@@ -1,8 +1,8 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, make_response, send_file, abort
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, make_response, send_file, abort, current_app
 from flask_login import login_required, current_user
 from functools import wraps
 from app import db
-from app.models import User, Case, SystemLog, AdminMessage, Announcement, BlogPost, FAQ, AISettings, Sighting
+from app.models import User, Case, SystemLog, AdminMessage, Announcement, BlogPost, FAQ, AISettings, Sighting, SearchVideo
 from sqlalchemy import func, desc, and_, or_, case
 from datetime import datetime, timedelta, date
 import csv
@@ -290,7 +290,8 @@ def case_detail(case_id):
         .order_by(SystemLog.timestamp.desc())
         .all()
     )
-    return render_template("admin/case_detail.html", case=case, logs=logs)
+    from app.vision_engine import HOG_PROFILES
+    return render_template("admin/case_detail.html", case=case, logs=logs, detection_profiles=list(HOG_PROFILES))
 
 
 @admin_bp.route("/cases/<int:case_id>/delete", methods=["POST"])
@@ -298,8 +299,27 @@ def case_detail(case_id):
 @admin_required
 def delete_case(case_id):
     case = Case.query.get_or_404(case_id)
+    from app.reprocessing import hand_over_duplicates
+    video_ids = [video.id for video in case.search_videos]
+    # Duplicates in other cases still match against these videos' archives
+    heirs = {}
+    for video in case.search_videos:
+        heir = hand_over_duplicates(video)
+        if heir is not None:
+            heirs[video.id] = heir.id
     db.session.delete(case)
     db.session.commit()
+
+    from app.face_archive import move_face_archive, remove_face_archive
+    from app.face_index import get_face_index
+    from app.tasks import index_video_faces
+    archive_folder = current_app.config.get("VISION_ARCHIVE_FOLDER", "face_archives")
+    index = get_face_index()
+    for video_id in video_ids:
+        if video_id in heirs and move_face_archive(archive_folder, video_id, heirs[video_id]):
+            index_video_faces.delay(heirs[video_id])
+        remove_face_archive(archive_folder, video_id)
+        index.delete(video_id)
     flash(f"Case for {case.person_name} deleted successfully")
     return redirect(url_for("admin.cases"))
 
@@ -320,6 +340,54 @@ def requeue_case(case_id):
     return redirect(url_for("admin.case_detail", case_id=case_id))
 
 
+@admin_bp.route("/cases/<int:case_id>/detection_profile", methods=["POST"])
+@login_required
+@admin_required
+def set_detection_profile(case_id):
+    """Choose the person detector profile of a case; videos are re-analyzed with it on the next run"""
+    from app.vision_engine import HOG_PROFILES
+
+    case = Case.query.get_or_404(case_id)
+    profile = request.form.get("detection_profile") or None
+    if profile is not None and profile not in HOG_PROFILES:
+        flash("Unknown detection profile", "error")
+        return redirect(url_for("admin.case_detail", case_id=case_id))
+
+    case.detection_profile = profile
+    db.session.add(SystemLog(
+        case_id=case.id,
+        user_id=current_user.id,
+        action="detection_profile_changed",
+        details=f"Detection profile set to {profile or 'automatic'}",
+    ))
+    db.session.commit()
+    flash(f"Detection profile set to {profile or 'automatic'}; re-queue the case to apply it")
+    return redirect(url_for("admin.case_detail", case_id=case_id))
+
+
+@admin_bp.route("/videos/<int:video_id>/match_active_cases", methods=["POST"])
+@login_required
+@admin_required
+def match_video_active_cases(video_id):
+    """Search one video for the targets of every active case in a single pass"""
+    video = SearchVideo.query.get_or_404(video_id)
+
+    from app.reprocessing import searched_case_ids
+
+    # Every case that searched this footage did so through a SearchVideo of its own
+    searched = searched_case_ids(video)
+    active_cases = Case.query.filter(Case.status.notin_(["Resolved", "Withdrawn"])).all()
+    case_ids = [c.id for c in active_cases if c.target_images and c.id not in searched]
+
+    if not case_ids:
+        flash("No active cases left to match against this video", "warning")
+    else:
+        from app.tasks import process_video_for_cases
+        process_video_for_cases.delay(video.id, case_ids)
+        flash(f"Matching {video.video_name} against {len(case_ids)} active cases")
+    return redirect(url_for("admin.case_detail", case_id=video.case_id))
+
+
 # ===== ADVANCED ADMIN FEATURES =====
 
 # Data Export Routes
@@ -539,7 +607,7 @@ def ai_settings():
         default_settings = [
             ('confidence_threshold', '0.7', 'Minimum confidence score for matches'),
             ('max_processing_time', '300', 'Maximum processing time per video (seconds)'),
-            ('face_detection_model', 'hog', 'Face detection model (hog/cnn)'),
+            ('face_detection_model', 'hog', 'Face detection model (hog/cnn/yunet)'),
             ('enable_clothing_analysis', 'true', 'Enable clothing-based matching')
         ]
         
@@ -0,0 +1,75 @@
+"""
+Clothing colour histograms for a cheap person pre-filter
+
+A person is described by the hue/saturation histogram of their torso.
+Brightness is left out so the same shirt under different lighting still
+matches. Histograms are L1-normalized float32 vectors, and similarity is the
+Bhattacharyya coefficient (1 = identical colour distribution, 0 = disjoint).
+For many people against several targets at once, that is one matrix product
+of square roots.
+"""
+import cv2
+import numpy as np
+
+HIST_BINS = (16, 8)  # hue, saturation
+HIST_SIZE = HIST_BINS[0] * HIST_BINS[1]
+HIST_DTYPE = np.float32
+MIN_TORSO_PIXELS = 400  # smaller torso crops are too noisy to describe anyone
+CLOTHING_IMAGE_TYPES = ("front", "full_body")  # photos that show what the person wore
+
+
+def person_torso(roi):
+    """Torso of a person box: below the head and above the legs, without the box's side padding"""
+    height, width = roi.shape[:2]
+    return roi[int(height * 0.2) : int(height * 0.55), int(width * 0.25) : int(width * 0.75)]
+
+
+def photo_torso(image, face_location=None):
+    """
+    Torso in a target photo: the area below the face when one was found,
+    else the upper-middle part of a full-body shot.
+    """
+    height, width = image.shape[:2]
+    if face_location is None:
+        return person_torso(image)
+    top, right, bottom, left = face_location
+    face_w, face_h = right - left, bottom - top
+    x0, x1 = max(0, int(left - 0.5 * face_w)), min(width, int(right + 0.5 * face_w))
+    y0, y1 = min(height, int(bottom + 0.3 * face_h)), min(height, int(bottom + 2.5 * face_h))
+    return image[y0:y1, x0:x1]
+
+
+def clothing_histogram(crop):
+    """Normalized hue/saturation histogram of a BGR crop, or None when it is too small"""
+    if crop.size == 0 or crop.shape[0] * crop.shape[1] < MIN_TORSO_PIXELS:
+        return None
+    hsv = cv2.cvtColor(crop, cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, list(HIST_BINS), [0, 180, 0, 256]).ravel().astype(HIST_DTYPE)
+    total = hist.sum()
+    return hist / total if total > 0 else None
+
+
+def pack_histograms(histograms):
+    return np.asarray(histograms, dtype=HIST_DTYPE).reshape(-1, HIST_SIZE).tobytes()
+
+
+def unpack_histograms(blob):
+    """Return an (n, HIST_SIZE) array; empty for a photo without a usable torso"""
+    if not blob:
+        return np.empty((0, HIST_SIZE), dtype=HIST_DTYPE)
+    return np.frombuffer(blob, dtype=HIST_DTYPE).reshape(-1, HIST_SIZE)
+
+
+def clothing_scores(histograms, target_roots):
+    """
+    Best Bhattacharyya coefficient of each histogram against the targets.
+
+    ``target_roots`` holds the element-wise square roots of the target
+    histograms, computed once per case. Rows that are None score 0.
+    """
+    scores = np.zeros(len(histograms))
+    valid = [i for i, hist in enumerate(histograms) if hist is not None]
+    if valid and len(target_roots):
+        roots = np.sqrt(np.vstack([histograms[i] for i in valid]))
+        scores[valid] = (roots @ target_roots.T).max(axis=1)
+    return scores
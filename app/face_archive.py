@@ -0,0 +1,219 @@
+"""
+Per-video archive of every face encoded during analysis
+
+Archives are structured ``.npy`` files (one row per face) that are opened
+memory-mapped, so matching new targets against hours of footage is a
+blockwise vector search that never decodes the video or loads the whole
+archive into memory.
+"""
+import glob
+import os
+import re
+
+import numpy as np
+
+from app.face_cache import ENCODING_DTYPE, ENCODING_SIZE
+
+FACE_DTYPE = np.dtype([
+    ("timestamp", np.float64),  # seconds into the video
+    ("track_id", np.int64),  # -1 when the video was not tracked
+    ("box", np.int32, (4,)),  # person box (x, y, w, h)
+    ("quality", np.float32),  # face area in pixels, discounted for blur and head turn
+    ("encoding", ENCODING_DTYPE, (ENCODING_SIZE,)),
+])
+
+ARCHIVE_PATTERN = re.compile(r"^video_(\d+)\.npy$")
+
+
+def face_archive_path(folder, video_id, segment_start=None):
+    """Archive file of a whole video, or the part written by one of its segments"""
+    if segment_start is None:
+        return os.path.join(folder, f"video_{video_id}.npy")
+    return os.path.join(folder, f"video_{video_id}_part_{int(round(segment_start * 1000))}.npy")
+
+
+def load_face_archive(path):
+    """Open a video's archive memory-mapped, or return None when it was never (fully) archived"""
+    if not os.path.exists(path):
+        return None
+    return FaceArchive(path)
+
+
+def remove_face_archive(folder, video_id):
+    """Delete a video's archive and any segment parts left behind"""
+    for path in [face_archive_path(folder, video_id)] + glob.glob(os.path.join(folder, f"video_{video_id}_part_*.npy*")):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def move_face_archive(folder, video_id, new_video_id):
+    """Hand a video's archive over to another video of the same footage; False when there is none"""
+    path = face_archive_path(folder, video_id)
+    if not os.path.exists(path):
+        return False
+    os.replace(path, face_archive_path(folder, new_video_id))
+    return True
+
+
+def archived_video_ids(folder):
+    """IDs of every SearchVideo with a complete archive in ``folder``"""
+    if not os.path.isdir(folder):
+        return []
+    return sorted(int(m.group(1)) for m in map(ARCHIVE_PATTERN.match, os.listdir(folder)) if m)
+
+
+def merge_face_archive_parts(folder, video_id, segment_starts):
+    """
+    Combine the segment parts of a chunked video into its archive.
+
+    Track ids restart in every segment and are offset to stay unique; a
+    person seen in the overlap of two segments ends up in two tracks whose
+    matches the event builder merges again. Returns False (and removes the
+    parts) when a segment left no part.
+    """
+    paths = [face_archive_path(folder, video_id, start) for start in segment_starts]
+    try:
+        if not all(os.path.exists(path) for path in paths):
+            return False
+        parts = [load_face_archive(path).faces for path in paths]
+        parts = [part for part in parts if len(part)]
+        path = face_archive_path(folder, video_id)
+        tmp_path = path + ".part"
+        if not parts:
+            with open(tmp_path, "wb") as f:
+                np.save(f, np.zeros(0, dtype=FACE_DTYPE))
+            os.replace(tmp_path, path)
+            return True
+        merged = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=FACE_DTYPE, shape=(sum(len(p) for p in parts),))
+        position, offset = 0, 0
+        for part in parts:
+            chunk = merged[position : position + len(part)]
+            chunk[:] = part
+            tracked = chunk["track_id"] >= 0
+            chunk["track_id"][tracked] += offset
+            if tracked.any():
+                offset = int(chunk["track_id"][tracked].max()) + 1
+            position += len(part)
+        merged.flush()
+        del merged, parts
+        os.replace(tmp_path, path)
+        return True
+    finally:
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def search_face_archives(folder, target_encodings, score, video_ids=None, min_confidence=0.0):
+    """
+    Vector search over archived footage, of any case.
+
+    Yields ``(video_id, archive, confidences)`` for every archived video
+    (or only ``video_ids``) with at least one face scoring above
+    ``min_confidence``; no video is decoded.
+    """
+    for video_id in archived_video_ids(folder) if video_ids is None else video_ids:
+        archive = load_face_archive(face_archive_path(folder, video_id))
+        if archive is None or len(archive) == 0:
+            continue
+        confidences = archive.match(target_encodings, score)
+        if (confidences > min_confidence).any():
+            yield video_id, archive, confidences
+
+
+class FaceArchive:
+    """Read-only, memory-mapped view of one video's archived faces"""
+
+    def __init__(self, path):
+        self.path = path
+        self.faces = np.load(path, mmap_mode="r")
+        if self.faces.dtype != FACE_DTYPE:
+            raise ValueError(f"Unexpected face archive layout in {path}")
+
+    def __len__(self):
+        return len(self.faces)
+
+    def __getitem__(self, field):
+        return self.faces[field]
+
+    def match(self, target_encodings, score, block_size=4096):
+        """
+        Score every archived face against the targets, ``block_size`` rows at
+        a time so only one block of encodings is paged in at once.
+
+        ``score`` maps an (n, 128) block of encodings to n confidences.
+        Returns a float array with one confidence per archived face.
+        """
+        confidences = np.zeros(len(self.faces))
+        if len(target_encodings) == 0:
+            return confidences
+        for start in range(0, len(self.faces), block_size):
+            block = np.asarray(self.faces["encoding"][start : start + block_size])
+            confidences[start : start + len(block)] = score(block)
+        return confidences
+
+
+class FaceArchiveWriter:
+    """
+    Stream the face encodings of one analysis run to disk.
+
+    One row per encoded face. Faces a tracked person reused an earlier
+    encoding for are stored with that encoding, so re-matching the archive
+    reproduces the live scores exactly. Rows are appended to a raw
+    ``.rows`` file as they arrive and turned into the final ``.npy`` by
+    ``close()``, so memory use does not grow with the video.
+    """
+
+    def __init__(self, path, buffer_rows=1024):
+        self.path = path
+        self.rows_path = path + ".rows"
+        self.buffer_rows = buffer_rows
+        self.buffer = np.zeros(buffer_rows, dtype=FACE_DTYPE)
+        self.buffered = 0
+        self.count = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.file = open(self.rows_path, "wb")
+
+    def add(self, timestamp, track_id, box, faces):
+        for quality, encoding in faces:
+            row = self.buffer[self.buffered]
+            row["timestamp"] = timestamp
+            row["track_id"] = track_id
+            row["box"] = box
+            row["quality"] = quality
+            row["encoding"] = encoding
+            self.buffered += 1
+            self.count += 1
+            if self.buffered == self.buffer_rows:
+                self._spill()
+
+    def _spill(self):
+        self.file.write(self.buffer[: self.buffered].tobytes())
+        self.buffered = 0
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        """Write the archive atomically so a reader never sees a partial file"""
+        self._spill()
+        self.file.close()
+        tmp_path = self.path + ".part"
+        if self.count:
+            rows = np.memmap(self.rows_path, dtype=FACE_DTYPE, mode="r", shape=(self.count,))
+            archive = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=FACE_DTYPE, shape=(self.count,))
+            archive[:] = rows
+            archive.flush()
+            del archive, rows
+        else:
+            # A video without faces still gets an (empty) archive, so it is never decoded again
+            with open(tmp_path, "wb") as f:
+                np.save(f, np.zeros(0, dtype=FACE_DTYPE))
+        os.replace(tmp_path, self.path)
+        os.remove(self.rows_path)
+
+    def discard(self):
+        if not self.file.closed:
+            self.file.close()
+        if os.path.exists(self.rows_path):
+            os.remove(self.rows_path)
@@ -0,0 +1,230 @@
+"""
+Face detection and embedding backends
+
+A backend finds faces in a BGR image and turns them into 128-d encodings.
+Every backend produces encodings on dlib's distance scale (the same person
+is closer than ~0.6), so matching, confidence thresholds, the face archive
+and the face index work unchanged whichever backend a deployment runs.
+
+- ``hog`` / ``cnn``: dlib through ``face_recognition``
+- ``yunet``: OpenCV's ``FaceDetectorYN`` (YuNet) and ``FaceRecognizerSF``
+  (SFace) ONNX models, several times faster than dlib on a CPU
+"""
+import os
+from abc import ABC, abstractmethod
+
+import cv2
+import numpy as np
+
+FACE_BACKENDS = ("hog", "cnn", "yunet")
+DLIB_TOLERANCE = 0.6  # same-person distance of dlib encodings (face_recognition.compare_faces)
+SFACE_L2_THRESHOLD = 1.128  # same-person distance of unit-length SFace features (OpenCV sample)
+
+_backends = {}
+
+
+def _scale_locations(locations, factor, shape):
+    """Map ``(top, right, bottom, left)`` locations found on a resized image back onto the original"""
+    height, width = shape[:2]
+    return [
+        (max(0, int(top * factor)), min(width, int(right * factor)), min(height, int(bottom * factor)), max(0, int(left * factor)))
+        for (top, right, bottom, left) in locations
+    ]
+
+
+def _downscale(image, scale):
+    return cv2.resize(image, None, fx=scale, fy=scale) if 0 < scale < 1 else image
+
+
+class FaceBackend(ABC):
+    """
+    Interface of a face backend.
+
+    ``locate(image, scale)`` returns ``(top, right, bottom, left)`` face
+    locations in ``image`` coordinates, detecting on a copy downscaled by
+    ``scale``. ``landmarks(image, locations)`` returns, per location, the
+    ``left_eye``, ``right_eye`` and ``nose`` points used for the pose
+    estimate. ``encode(image, locations)`` returns one 128-d encoding per
+    location. Locations must come from ``locate()`` on the same image.
+    ``version`` identifies everything that changes the encodings.
+    """
+
+    name = None
+
+    @property
+    @abstractmethod
+    def version(self):
+        pass
+
+    @abstractmethod
+    def locate(self, image, scale=1.0):
+        pass
+
+    @abstractmethod
+    def landmarks(self, image, locations):
+        pass
+
+    @abstractmethod
+    def encode(self, image, locations):
+        pass
+
+
+class DlibFaceBackend(FaceBackend):
+    """dlib HOG or CNN detector and dlib's ResNet embedder"""
+
+    def __init__(self, model="hog"):
+        # Imported here so the other backends work without dlib installed
+        import face_recognition
+
+        self.face_recognition = face_recognition
+        self.name = model
+        self.model = model
+        self._last = (None, None)  # (bgr image, its rgb copy) of the last locate(), reused by encode()
+
+    @property
+    def version(self):
+        return f"dlib-resnet-v1/fr-{self.face_recognition.__version__}/{self.model}"
+
+    def locate(self, image, scale=1.0):
+        # Always convert: frame sources may hand over the same buffer with new pixels
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        self._last = (image, rgb)
+        small = _downscale(rgb, scale)
+        locations = self.face_recognition.face_locations(small, model=self.model)
+        if small is rgb:
+            return locations
+        return _scale_locations(locations, rgb.shape[1] / small.shape[1], rgb.shape)
+
+    def _rgb(self, image):
+        return self._last[1] if self._last[0] is image else cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+    def landmarks(self, image, locations):
+        if not locations:
+            return []
+        # The 5-point model is the one the encoder aligns with, and far cheaper than the 68-point one
+        return [
+            {
+                "left_eye": tuple(sum(p[i] for p in points["left_eye"]) / len(points["left_eye"]) for i in (0, 1)),
+                "right_eye": tuple(sum(p[i] for p in points["right_eye"]) / len(points["right_eye"]) for i in (0, 1)),
+                "nose": points["nose_tip"][0],
+            }
+            for points in self.face_recognition.face_landmarks(self._rgb(image), locations, model="small")
+        ]
+
+    def encode(self, image, locations):
+        if not locations:
+            return []
+        return self.face_recognition.face_encodings(self._rgb(image), locations)
+
+
+class OpenCVFaceBackend(FaceBackend):
+    """
+    YuNet detector and SFace embedder from OpenCV's DNN module.
+
+    SFace features are normalized to unit length and scaled so that its
+    same-person threshold lands on dlib's 0.6; euclidean distances between
+    the resulting encodings are comparable to dlib's.
+    """
+
+    name = "yunet"
+
+    def __init__(self, detector_model, recognizer_model, score_threshold=0.8, nms_threshold=0.3, top_k=5000):
+        if not hasattr(cv2, "FaceDetectorYN"):
+            raise RuntimeError(f"OpenCV {cv2.__version__} has no FaceDetectorYN; 4.5.4 or later is required")
+        for path in (detector_model, recognizer_model):
+            if not path or not os.path.exists(path):
+                raise FileNotFoundError(f"Face model not found: {path}")
+        self.detector_model = detector_model
+        self.recognizer_model = recognizer_model
+        self.detector = cv2.FaceDetectorYN.create(detector_model, "", (320, 320), score_threshold, nms_threshold, top_k)
+        self.recognizer = cv2.FaceRecognizerSF.create(recognizer_model, "")
+        self._detections = {}  # location -> YuNet row (box, landmarks, score) of the last locate()
+
+    @property
+    def version(self):
+        models = "/".join(os.path.basename(path) for path in (self.detector_model, self.recognizer_model))
+        return f"opencv-{cv2.__version__}/{models}"
+
+    def locate(self, image, scale=1.0):
+        small = _downscale(image, scale)
+        height, width = small.shape[:2]
+        self.detector.setInputSize((width, height))
+        _, faces = self.detector.detect(small)
+
+        self._detections = {}
+        if faces is None:
+            return []
+        factor = image.shape[1] / width
+        frame_h, frame_w = image.shape[:2]
+        locations = []
+        for row in faces:
+            row = row.copy()
+            row[:14] *= factor  # box and five landmarks; the last column is the score
+            x, y, w, h = row[:4]
+            location = (max(0, int(y)), min(frame_w, int(x + w)), min(frame_h, int(y + h)), max(0, int(x)))
+            self._detections[location] = row
+            locations.append(location)
+        return locations
+
+    def _row(self, location):
+        row = self._detections.get(tuple(location))
+        if row is None:
+            raise ValueError(f"Face location {location} was not found by the last locate() call")
+        return row
+
+    def landmarks(self, image, locations):
+        # YuNet landmark columns: right eye, left eye, nose tip, right and left mouth corners
+        return [
+            {"right_eye": (row[4], row[5]), "left_eye": (row[6], row[7]), "nose": (row[8], row[9])}
+            for row in map(self._row, locations)
+        ]
+
+    def encode(self, image, locations):
+        encodings = []
+        for row in map(self._row, locations):
+            feature = self.recognizer.feature(self.recognizer.alignCrop(image, row)).astype(np.float64).ravel()
+            norm = np.linalg.norm(feature)
+            encodings.append(feature / norm * (DLIB_TOLERANCE / SFACE_L2_THRESHOLD) if norm > 0 else feature)
+        return encodings
+
+
+def create_face_backend(name="hog", yunet_model=None, sface_model=None):
+    """Instantiate a backend by name; used by worker processes without an app context"""
+    if name in ("hog", "cnn"):
+        return DlibFaceBackend(name)
+    if name == "yunet":
+        return OpenCVFaceBackend(yunet_model, sface_model)
+    raise ValueError(f"Unknown face backend: {name}")
+
+
+def configured_face_backend():
+    """The admin-selected backend (AISettings ``face_detection_model``), else VISION_FACE_BACKEND."""
+    from flask import current_app
+
+    from app.models import AISettings
+
+    setting = AISettings.query.filter_by(setting_name="face_detection_model").first()
+    if setting and setting.setting_value in FACE_BACKENDS:
+        return setting.setting_value
+    return current_app.config.get("VISION_FACE_BACKEND", "hog")
+
+
+def face_backend_settings():
+    """Everything a worker needs to create the configured backend"""
+    from flask import current_app
+
+    config = current_app.config
+    return {
+        "name": configured_face_backend(),
+        "yunet_model": config.get("VISION_YUNET_MODEL"),
+        "sface_model": config.get("VISION_SFACE_MODEL"),
+    }
+
+
+def get_face_backend():
+    """The configured backend, created once per process"""
+    settings = face_backend_settings()
+    key = tuple(sorted(settings.items()))
+    if key not in _backends:
+        _backends[key] = create_face_backend(**settings)
+    return _backends[key]
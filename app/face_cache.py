@@ -0,0 +1,135 @@
+"""
+Persistent face-encoding cache for target images
+"""
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+from flask import current_app
+from PIL import Image, ImageOps
+
+from app import db
+from app.utils import validate_file_path
+
+ENCODING_SIZE = 128
+ENCODING_DTYPE = np.float64
+
+
+def encoding_model_version(backend):
+    """Identify everything that changes the encodings of an image"""
+    max_side = current_app.config.get("VISION_TARGET_MAX_SIDE", 1024)
+    return f"{backend.version}/{max_side}px"
+
+
+def file_sha256(path):
+    """Hash file content in chunks so large photos are not read into memory at once"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def resolve_target_image_path(target_image):
+    """Return the on-disk path of a target image, or None if the stored path is unsafe"""
+    upload_folder = current_app.config.get("UPLOAD_FOLDER", "app/static/uploads")
+    return validate_file_path(target_image.image_path, upload_folder)
+
+
+def pack_encodings(encodings):
+    return np.asarray(encodings, dtype=ENCODING_DTYPE).reshape(-1, ENCODING_SIZE).tobytes()
+
+
+def unpack_encodings(blob):
+    if not blob:
+        return np.empty((0, ENCODING_SIZE), dtype=ENCODING_DTYPE)
+    return np.frombuffer(blob, dtype=ENCODING_DTYPE).reshape(-1, ENCODING_SIZE)
+
+
+def normalize_target_image(image_path):
+    """Decode a photo once, apply EXIF orientation and downscale it to VISION_TARGET_MAX_SIDE (RGB array)"""
+    max_side = current_app.config.get("VISION_TARGET_MAX_SIDE", 1024)
+    with Image.open(image_path) as img:
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        img.thumbnail((max_side, max_side))
+        return np.array(img)
+
+
+def analyze_target_image(target_image, backend=None):
+    """
+    Decode, normalize and encode a target image, storing the results on its row.
+
+    Saves the normalized copy next to the original, records the face
+    locations found in it and caches their encodings and, for photos
+    showing clothing, the torso colour histogram. Returns the number of
+    faces found, or None if the image path is unsafe.
+    """
+    image_path = resolve_target_image_path(target_image)
+    if not image_path:
+        logging.warning(f"Invalid image path for target image {target_image.id}")
+        return None
+
+    from app.face_backends import get_face_backend
+
+    backend = backend or get_face_backend()
+    content_hash = file_sha256(image_path)
+    image = normalize_target_image(image_path)
+
+    normalized_name = os.path.splitext(os.path.basename(image_path))[0] + "_norm.jpg"
+    Image.fromarray(image).save(os.path.join(os.path.dirname(image_path), normalized_name), quality=90)
+
+    bgr = np.ascontiguousarray(image[:, :, ::-1])
+    locations = backend.locate(bgr)
+    encodings = backend.encode(bgr, locations)
+
+    from app.clothing import CLOTHING_IMAGE_TYPES, clothing_histogram, pack_histograms, photo_torso
+
+    histogram = None
+    # The torso is only unambiguous below a single face, or in a full-body shot without one
+    if target_image.image_type in CLOTHING_IMAGE_TYPES and len(locations) == 1:
+        histogram = clothing_histogram(photo_torso(bgr, locations[0]))
+    elif target_image.image_type == "full_body" and not locations:
+        histogram = clothing_histogram(photo_torso(bgr))
+
+    target_image.normalized_path = os.path.join("static", "uploads", normalized_name).replace("\\", "/")
+    target_image.face_locations = json.dumps([list(loc) for loc in locations])
+    target_image.face_count = len(locations)
+    target_image.encoding_cache = pack_encodings(encodings)
+    target_image.clothing_histogram = pack_histograms([histogram] if histogram is not None else [])
+    target_image.encoding_key = f"{content_hash}:{encoding_model_version(backend)}"
+    db.session.commit()
+    logging.info(f"Cached {len(encodings)} face encodings for target image {target_image.id}")
+    return len(locations)
+
+
+def get_target_encodings(target_image, backend=None):
+    """
+    Return the face encodings of a target image as an (n, 128) array.
+
+    Encodings are stored on the TargetImage row together with a key made of
+    the image content hash and the model version, and recomputed only when
+    either changes.
+    """
+    image_path = resolve_target_image_path(target_image)
+    if not image_path:
+        logging.warning(f"Invalid image path for target image {target_image.id}")
+        return unpack_encodings(None)
+
+    from app.face_backends import get_face_backend
+
+    backend = backend or get_face_backend()
+    cache_key = f"{file_sha256(image_path)}:{encoding_model_version(backend)}"
+    if target_image.encoding_key != cache_key or target_image.encoding_cache is None:
+        analyze_target_image(target_image, backend)
+    return unpack_encodings(target_image.encoding_cache)
+
+
+def get_target_clothing_histograms(target_image, backend=None):
+    """Return the torso histograms of a target image as an (n, HIST_SIZE) array, analyzing it if never done"""
+    from app.clothing import unpack_histograms
+
+    if target_image.clothing_histogram is None:
+        analyze_target_image(target_image, backend)
+    return unpack_histograms(target_image.clothing_histogram)
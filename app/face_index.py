@@ -0,0 +1,279 @@
+"""
+Cross-case approximate nearest-neighbour index over archived video faces
+
+An inverted-file (IVF) index in plain NumPy: encodings are assigned to the
+nearest of ``nlist`` k-means centroids and appended to that centroid's
+list file. A query only scans the ``nprobe`` lists closest to it, so
+asking "has this face appeared in any footage we hold?" reads a small
+fraction of the stored faces. Videos are added incrementally and deleted
+with tombstones that ``compact()`` later purges.
+"""
+import errno
+import json
+import os
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from flask import current_app
+
+from app.face_cache import ENCODING_SIZE
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+INDEX_DTYPE = np.float32
+ENTRY_DTYPE = np.dtype([
+    ("video_id", np.int64),
+    ("row", np.int64),  # row of the face in the video's archive
+    ("encoding", INDEX_DTYPE, (ENCODING_SIZE,)),
+])
+LOCK_TIMEOUT = 300  # seconds to wait for another worker's index lock where locks cannot block (Windows)
+POINTS_PER_LIST = 39  # fewer training points per centroid gives unstable lists
+
+
+def _sq_distances(x, centroids):
+    """Squared euclidean distances between rows of ``x`` and the centroids, shape (len(x), nlist)"""
+    sq = np.einsum("ij,ij->i", x, x)[:, None] + np.einsum("ij,ij->i", centroids, centroids)[None, :]
+    return np.maximum(sq - 2.0 * (x @ centroids.T), 0.0)
+
+
+def train_centroids(sample, nlist, iterations=10, seed=0):
+    """Plain Lloyd's k-means on a sample of encodings"""
+    sample = np.asarray(sample, dtype=INDEX_DTYPE)
+    nlist = max(1, min(nlist, len(sample) // POINTS_PER_LIST))
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _sq_distances(sample, centroids).argmin(axis=1)
+        for c in range(nlist):
+            members = sample[assignment == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+    return centroids
+
+
+def _lock_file(f):
+    """Block until this process holds an exclusive lock on the open file ``f``"""
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        return
+    # msvcrt locks a byte range and gives up with EDEADLOCK after 10 s of its own retries
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError as e:
+            if e.errno != errno.EDEADLOCK or time.monotonic() >= deadline:
+                raise
+
+
+def _unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def get_face_index():
+    """The application's shared face index"""
+    config = current_app.config
+    return FaceIndex(config.get("VISION_INDEX_FOLDER", "face_index"), config.get("VISION_INDEX_LISTS", 256))
+
+
+class FaceIndex:
+    """
+    On-disk IVF index in ``folder``:
+
+    - ``centroids.npy``: the (nlist, 128) coarse quantizer
+    - ``list_<n>.bin``: append-only ENTRY_DTYPE records of list n
+    - ``manifest.json``: indexed and deleted video ids
+
+    Writers take an exclusive file lock, so several workers can add videos.
+    """
+
+    def __init__(self, folder, nlist=256):
+        self.folder = folder
+        self.nlist = nlist
+        self.centroids_path = os.path.join(folder, "centroids.npy")
+        self.manifest_path = os.path.join(folder, "manifest.json")
+        self._centroids = None
+
+    @contextmanager
+    def _locked(self):
+        os.makedirs(self.folder, exist_ok=True)
+        with open(os.path.join(self.folder, ".lock"), "w") as lock:
+            _lock_file(lock)
+            try:
+                yield
+            finally:
+                _unlock_file(lock)
+
+    def _list_path(self, n):
+        return os.path.join(self.folder, f"list_{n:04d}.bin")
+
+    def _read_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {"videos": [], "deleted": [], "entries": 0}
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest):
+        tmp_path = self.manifest_path + ".part"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    @property
+    def centroids(self):
+        if self._centroids is None and os.path.exists(self.centroids_path):
+            self._centroids = np.load(self.centroids_path)
+        return self._centroids
+
+    @property
+    def video_ids(self):
+        manifest = self._read_manifest()
+        return sorted(set(manifest["videos"]) - set(manifest["deleted"]))
+
+    def add(self, video_id, encodings):
+        """Index (or re-index) the archived encodings of one video; trains the quantizer on first use"""
+        encodings = np.asarray(encodings, dtype=INDEX_DTYPE).reshape(-1, ENCODING_SIZE)
+        with self._locked():
+            manifest = self._read_manifest()
+            if video_id in manifest["videos"]:
+                self._purge([video_id])
+                manifest = self._read_manifest()
+            if len(encodings) and self.centroids is None:
+                self._centroids = train_centroids(encodings, self.nlist)
+                np.save(self.centroids_path, self._centroids)
+
+            if len(encodings):
+                entries = np.zeros(len(encodings), dtype=ENTRY_DTYPE)
+                entries["video_id"] = video_id
+                entries["row"] = np.arange(len(encodings))
+                entries["encoding"] = encodings
+                assignment = np.concatenate([
+                    _sq_distances(encodings[start : start + 4096], self.centroids).argmin(axis=1)
+                    for start in range(0, len(encodings), 4096)
+                ])
+                for n in np.unique(assignment):
+                    with open(self._list_path(int(n)), "ab") as f:
+                        f.write(entries[assignment == n].tobytes())
+
+            manifest["videos"] = sorted(set(manifest["videos"]) | {video_id})
+            manifest["deleted"] = [v for v in manifest["deleted"] if v != video_id]
+            manifest["entries"] = manifest.get("entries", 0) + len(encodings)
+            self._write_manifest(manifest)
+
+    @property
+    def needs_training(self):
+        """True when the index has grown far beyond what its quantizer was trained for"""
+        if self.centroids is None:
+            return False
+        wanted = min(self.nlist, self._read_manifest().get("entries", 0) // POINTS_PER_LIST)
+        return len(self.centroids) * 2 <= wanted
+
+    def rebuild(self, videos, sample_size=100000, seed=0):
+        """
+        Retrain the quantizer on a sample of all faces and re-index every video.
+
+        ``videos`` is a callable returning an iterable of ``(video_id, encodings)``;
+        it is consumed twice, once for sampling and once for indexing.
+        """
+        rng = np.random.default_rng(seed)
+        sample = []
+        for _, encodings in videos():
+            if len(encodings):
+                take = min(len(encodings), max(1, sample_size // 100))
+                sample.append(np.asarray(encodings[np.sort(rng.choice(len(encodings), take, replace=False))]))
+        with self._locked():
+            for name in os.listdir(self.folder):
+                if name.startswith("list_") or name in ("centroids.npy", "manifest.json"):
+                    os.remove(os.path.join(self.folder, name))
+            self._centroids = None
+            if sample:
+                self._centroids = train_centroids(np.concatenate(sample)[:sample_size], self.nlist)
+                np.save(self.centroids_path, self._centroids)
+        for video_id, encodings in videos():
+            self.add(video_id, encodings)
+
+    def delete(self, video_id):
+        """Hide a video from queries at once; its entries are dropped by the next compact()"""
+        with self._locked():
+            manifest = self._read_manifest()
+            if video_id in manifest["videos"] and video_id not in manifest["deleted"]:
+                manifest["deleted"].append(video_id)
+                self._write_manifest(manifest)
+
+    def compact(self):
+        """Rewrite the lists without deleted videos; returns how many videos were purged"""
+        with self._locked():
+            deleted = self._read_manifest()["deleted"]
+            if deleted:
+                self._purge(deleted)
+            return len(deleted)
+
+    def _purge(self, video_ids):
+        """Drop the entries of ``video_ids`` from every list (caller holds the lock)"""
+        if self.centroids is not None:
+            for n in range(len(self.centroids)):
+                path = self._list_path(n)
+                if not os.path.exists(path):
+                    continue
+                entries = np.fromfile(path, dtype=ENTRY_DTYPE)
+                keep = entries[~np.isin(entries["video_id"], video_ids)]
+                if len(keep) != len(entries):
+                    with open(path + ".part", "wb") as f:
+                        f.write(keep.tobytes())
+                    os.replace(path + ".part", path)
+        manifest = self._read_manifest()
+        manifest["videos"] = [v for v in manifest["videos"] if v not in video_ids]
+        manifest["deleted"] = [v for v in manifest["deleted"] if v not in video_ids]
+        manifest["entries"] = sum(
+            os.path.getsize(self._list_path(n)) // ENTRY_DTYPE.itemsize
+            for n in range(len(self.centroids) if self.centroids is not None else 0)
+            if os.path.exists(self._list_path(n))
+        )
+        self._write_manifest(manifest)
+
+    def query(self, encodings, k=10, nprobe=8, max_distance=None):
+        """
+        Return, per query encoding, up to ``k`` ``(video_id, row, distance)``
+        nearest indexed faces found in the ``nprobe`` closest lists.
+        """
+        queries = np.asarray(encodings, dtype=INDEX_DTYPE).reshape(-1, ENCODING_SIZE)
+        if self.centroids is None or len(queries) == 0:
+            return [[] for _ in queries]
+
+        deleted = np.asarray(self._read_manifest()["deleted"], dtype=np.int64)
+        probes = np.argsort(_sq_distances(queries, self.centroids), axis=1)[:, :nprobe]
+        lists = {}
+        results = []
+        for query, probe in zip(queries, probes):
+            candidates = []
+            for n in probe:
+                n = int(n)
+                if n not in lists:
+                    path = self._list_path(n)
+                    lists[n] = np.fromfile(path, dtype=ENTRY_DTYPE) if os.path.exists(path) else np.zeros(0, ENTRY_DTYPE)
+                candidates.append(lists[n])
+            candidates = np.concatenate(candidates)
+            if len(deleted):
+                candidates = candidates[~np.isin(candidates["video_id"], deleted)]
+            if len(candidates) == 0:
+                results.append([])
+                continue
+
+            distances = np.sqrt(_sq_distances(candidates["encoding"], query[None, :])[:, 0])
+            order = np.argsort(distances)[:k]
+            if max_distance is not None:
+                order = order[distances[order] <= max_distance]
+            results.append([
+                (int(candidates["video_id"][i]), int(candidates["row"][i]), float(distances[i])) for i in order
+            ])
+        return results
@@ -6,7 +6,7 @@ import shutil
 from datetime import datetime, timedelta
 from flask import current_app
 from app import db
-from app.models import Case, TargetImage, SearchVideo
+from app.models import Case, TargetImage, SearchVideo, Sighting
 
 
 def cleanup_orphaned_files():
@@ -21,11 +21,11 @@ def cleanup_orphaned_files():
     # Get all files referenced in database
     referenced_files = set()
     
-    # Add target image files
+    # Add target image files and their normalized copies
     for image in TargetImage.query.all():
-        if image.image_path:
-            filename = os.path.basename(image.image_path)
-            referenced_files.add(filename)
+        for path in (image.image_path, image.normalized_path):
+            if path:
+                referenced_files.add(os.path.basename(path))
     
     # Add search video files
     for video in SearchVideo.query.all():
@@ -33,6 +33,11 @@ def cleanup_orphaned_files():
             filename = os.path.basename(video.video_path)
             referenced_files.add(filename)
     
+    # Add sighting thumbnails
+    for sighting in Sighting.query.with_entities(Sighting.thumbnail_path).all():
+        if sighting.thumbnail_path:
+            referenced_files.add(os.path.basename(sighting.thumbnail_path))
+    
     # Check for orphaned files
     orphaned_files = []
     for filename in os.listdir(upload_folder):
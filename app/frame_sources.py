@@ -0,0 +1,283 @@
+"""
+Frame sources for video analysis
+"""
+import logging
+import math
+import os
+import shutil
+import subprocess
+import tempfile
+
+import cv2
+import numpy as np
+
+
+def probe_video(path):
+    """Read fps, frame count, duration and resolution from a video's container metadata"""
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            return None
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        return {
+            "fps": fps,
+            "frame_count": frame_count,
+            "duration": frame_count / fps if fps > 0 else None,
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        }
+    finally:
+        cap.release()
+
+
+def video_fingerprint(path, samples=8):
+    """
+    Perceptual fingerprint of a video: a 64-bit difference hash (dHash) of
+    ``samples`` frames spread evenly over it, as one hex string. Re-encoding,
+    resizing or a different container leave it (nearly) unchanged.
+    """
+    cap = cv2.VideoCapture(path)
+    try:
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        if not cap.isOpened() or frame_count <= 0:
+            return None
+        hashes = []
+        for i in range(samples):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int((i + 0.5) * frame_count / samples))
+            ret, frame = cap.read()
+            if not ret:
+                return None
+            small = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (9, 8), interpolation=cv2.INTER_AREA)
+            bits = (small[:, 1:] > small[:, :-1]).flatten()
+            hashes.append(f"{int(''.join('1' if b else '0' for b in bits), 2):016x}")
+        return "".join(hashes)
+    finally:
+        cap.release()
+
+
+def fingerprint_distance(a, b):
+    """Mean number of differing bits per sampled frame between two fingerprints (0-64)"""
+    if not a or not b or len(a) != len(b):
+        return None
+    frames = range(0, len(a), 16)
+    return sum(bin(int(a[i : i + 16], 16) ^ int(b[i : i + 16], 16)).count("1") for i in frames) / len(frames)
+
+
+def plan_segments(duration, fps, chunk_frames, min_seconds=120.0, overlap=10.0):
+    """
+    Split a video into evenly sized, overlapping ``(start, end)`` time ranges.
+
+    Segment length targets ``chunk_frames`` decoded frames, so a 60 fps
+    recording gets shorter segments than a 10 fps one, but never less than
+    ``min_seconds``. Each segment starts ``overlap`` seconds before its
+    nominal start so people crossing the boundary are seen whole by both
+    sides. The last segment is open-ended. Videos without duration or fps
+    metadata are not split.
+    """
+    if not duration or not fps or fps <= 0:
+        return [(0.0, None)]
+    segment_seconds = max(min_seconds, chunk_frames / fps)
+    count = int(math.ceil(duration / segment_seconds))
+    if count <= 1:
+        return [(0.0, None)]
+    length = duration / count
+    return [
+        (max(0.0, i * length - overlap), None if i == count - 1 else (i + 1) * length)
+        for i in range(count)
+    ]
+
+
+def sample_step(fps, sample_rate, fallback_step=15):
+    """Source frames between samples; fractional so 2 samples/sec stays exact at 29.97 fps"""
+    if fps > 0 and sample_rate > 0:
+        return max(1.0, fps / sample_rate)
+    # Unknown frame rate: fall back to a fixed frame stride
+    return float(max(1, fallback_step))
+
+
+def sampled_frame(start_frame, step, k):
+    """Frame number of the k-th sample; FrameSampler and FFmpegFrameSource pick exactly the same frames"""
+    return start_frame + int(math.floor(k * step + 0.5))
+
+
+class FrameSampler:
+    """
+    Sample frames from a ``cv2.VideoCapture`` at a fixed wall-clock rate.
+
+    Frames between samples are skipped with ``grab()`` (demux + decode, no
+    colour conversion or copy), and long gaps are crossed by seeking when
+    the container reports a frame count. ``start_time``/``end_time`` limit
+    sampling to a time range. Iterating yields ``(frame_number, frame)`` pairs.
+    """
+
+    def __init__(self, cap, sample_rate, seek_min_gap=0, fallback_step=15, start_time=0.0, end_time=None):
+        self.cap = cap
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        self.frame_total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+
+        self.step = sample_step(self.fps, sample_rate, fallback_step)
+
+        # Seeking only pays off for gaps longer than a typical GOP and needs a seekable container
+        self.seek_min_gap = seek_min_gap if seek_min_gap > 0 and self.frame_total > 0 else 0
+
+        self.start_frame = int(start_time * self.fps) if self.fps > 0 else 0
+        self.end_frame = int(math.ceil(end_time * self.fps)) if end_time is not None and self.fps > 0 else None
+
+        self.frames_grabbed = 0
+        self.frames_decoded = 0
+        self.seeks = 0
+
+    def _advance_to(self, position, target):
+        """Move the capture from ``position`` to ``target`` without decoding pixels. Returns False at EOF."""
+        gap = target - position
+        if self.seek_min_gap and gap >= self.seek_min_gap:
+            if self.cap.set(cv2.CAP_PROP_POS_FRAMES, target):
+                self.seeks += 1
+                return True
+
+        for _ in range(gap):
+            if not self.cap.grab():
+                return False
+            self.frames_grabbed += 1
+        return True
+
+    def __iter__(self):
+        # The capture may have been read before (two-pass mode samples the same one per window)
+        position = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES) or 0)  # index of the next frame the capture will return
+        if position != self.start_frame and self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame):
+            position = self.start_frame
+            self.seeks += 1
+        k = 0
+        while True:
+            target = sampled_frame(self.start_frame, self.step, k)
+            k += 1
+            if self.frame_total and target >= self.frame_total:
+                break
+            if self.end_frame is not None and target >= self.end_frame:
+                break
+            if target < position:
+                # Could not seek back: skip the samples already behind the capture rather than mislabel frames
+                continue
+            if not self._advance_to(position, target):
+                break
+
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            self.frames_decoded += 1
+            yield target, frame
+
+            position = target + 1
+
+
+def decode_size(width, height, max_height):
+    """Frame size after limiting the height to ``max_height``, keeping the aspect ratio and even dimensions"""
+    if not max_height or height <= max_height:
+        return width, height
+    return max(2, int(round(width * max_height / height / 2)) * 2), int(max_height) // 2 * 2
+
+
+FFMPEG_ERROR_TAIL = 4096  # bytes of ffmpeg's error output kept for the log
+
+
+def ffmpeg_available(binary="ffmpeg"):
+    return shutil.which(binary) is not None
+
+
+def _read_exactly(stream, view):
+    """Fill ``view`` from ``stream``; False at end of stream (a trailing partial frame is dropped)"""
+    filled = 0
+    while filled < len(view):
+        count = stream.readinto(view[filled:])
+        if not count:
+            return False
+        filled += count
+    return True
+
+
+class FFmpegFrameSource:
+    """
+    Decode sampled, downscaled frames with an ffmpeg subprocess.
+
+    ffmpeg selects the same frames FrameSampler would read, by frame
+    number, scales them inside the decoder and writes raw BGR frames to a
+    pipe. Each frame is read with ``readinto``
+    into one reused buffer and exposed through ``np.frombuffer``, so no
+    per-frame allocation happens in Python; the yielded array is overwritten
+    by the next frame unless ``reuse_buffer`` is False. Iterating yields
+    ``(frame_number, frame)`` pairs numbered at the source frame rate, like
+    FrameSampler, so the two are interchangeable.
+    """
+
+    def __init__(self, path, fps, width, height, sample_rate, start_time=0.0, end_time=None,
+                 max_height=720, reuse_buffer=True, binary="ffmpeg"):
+        self.path = path
+        self.fps = fps
+        self.source_size = (width, height)
+        self.size = decode_size(width, height, max_height)
+        self.sample_rate = sample_rate
+        self.step = sample_step(fps, sample_rate)
+        self.start_frame = int(start_time * fps)
+        self.end_frame = int(math.ceil(end_time * fps)) if end_time is not None else None
+        self.start_time = start_time
+        self.end_time = end_time
+        self.reuse_buffer = reuse_buffer
+        self.binary = binary
+
+        self.frames_grabbed = 0  # frames skipped inside ffmpeg are not visible here
+        self.frames_decoded = 0
+        self.seeks = 1 if start_time else 0
+
+    def _command(self):
+        # n counts frames from start_frame; keep n when it is the sampled_frame() of its k
+        step = repr(self.step)
+        filters = [f"select=eq(n\\,floor(floor(n/{step}+0.5)*{step}+0.5))"]
+        if self.size != self.source_size:
+            filters.append(f"scale={self.size[0]}:{self.size[1]}:flags=area")
+        command = [self.binary, "-nostdin", "-hide_banner", "-loglevel", "error"]
+        if self.start_frame:
+            # Half a frame early, so decoding starts exactly at start_frame
+            command += ["-ss", f"{(self.start_frame - 0.5) / self.fps:.6f}"]
+        command += ["-i", self.path]
+        if self.end_frame is not None:
+            command += ["-t", f"{max(0, self.end_frame - self.start_frame + 1) / self.fps:.6f}"]
+        return command + [
+            "-an", "-sn", "-vf", ",".join(filters), "-vsync", "passthrough",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1",
+        ]
+
+    def __iter__(self):
+        width, height = self.size
+        frame_bytes = width * height * 3
+        # Errors go to a file: corrupt streams log one per frame, and a full stderr pipe would stall ffmpeg
+        stderr = tempfile.TemporaryFile()
+        process = subprocess.Popen(self._command(), stdout=subprocess.PIPE, stderr=stderr)
+        buffer = None
+        try:
+            index = 0
+            while True:
+                if buffer is None or not self.reuse_buffer:
+                    buffer = bytearray(frame_bytes)
+                    view = memoryview(buffer)
+                    frame = np.frombuffer(buffer, dtype=np.uint8).reshape(height, width, 3)
+                frame_number = sampled_frame(self.start_frame, self.step, index)
+                if self.end_frame is not None and frame_number >= self.end_frame:
+                    break
+                if not _read_exactly(process.stdout, view):
+                    break
+                self.frames_decoded += 1
+                yield frame_number, frame
+                index += 1
+        finally:
+            process.stdout.close()
+            if process.poll() is None:
+                process.kill()
+            returncode = process.wait()
+            stderr.seek(max(0, stderr.seek(0, os.SEEK_END) - FFMPEG_ERROR_TAIL))
+            errors = stderr.read().decode(errors="replace").strip()
+            stderr.close()
+            if returncode not in (0, -9) and not self.frames_decoded:
+                raise IOError(f"ffmpeg could not decode {self.path}: {errors}")
+            if errors:
+                logging.warning(f"ffmpeg reported errors decoding {self.path}: {errors}")
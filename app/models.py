@@ -1,3 +1,4 @@
+import json
 from datetime import datetime, timedelta
 from flask_login import UserMixin
 from flask_bcrypt import generate_password_hash, check_password_hash
@@ -19,6 +20,7 @@ class Case(db.Model):
         db.String(20), default="Queued"
     )  # Queued, Processing, Active, Resolved, Withdrawn
     priority = db.Column(db.String(10), default="Medium")  # Low, Medium, High, Critical
+    detection_profile = db.Column(db.String(20))  # fast, balanced, thorough; None follows the priority
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     assigned_to = db.Column(db.Integer, db.ForeignKey("user.id"))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -112,6 +114,17 @@ class TargetImage(db.Model):
     is_primary = db.Column(db.Boolean, default=False)
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Filled in by the prepare_target_image task right after upload
+    normalized_path = db.Column(db.String(200))  # EXIF-rotated, downscaled RGB copy
+    face_locations = db.Column(db.Text)  # JSON list of (top, right, bottom, left) in the normalized copy
+    face_count = db.Column(db.Integer)  # None until analyzed; 0 flags a photo with no usable face
+
+    # Cached face encodings (float64 rows of 128) and the "<content sha256>:<model version>" they belong to
+    encoding_cache = db.Column(db.LargeBinary)
+    encoding_key = db.Column(db.String(128))
+    # float32 hue/saturation histogram of the torso; empty when the photo shows no usable torso
+    clothing_histogram = db.Column(db.LargeBinary)
+
     def __repr__(self):
         return f"<TargetImage {self.image_type} for Case {self.case_id}>"
 
@@ -131,14 +144,52 @@ class SearchVideo(db.Model):
     )  # Pending, Processing, Completed, Failed
     processed_at = db.Column(db.DateTime)
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+    analysis_stats = db.Column(db.Text)  # JSON string of per-video processing counters
+    detection_signature = db.Column(db.String(64))  # hash of the settings the face archive was built with
+    match_signature = db.Column(db.String(64))  # hash of the targets and thresholds the sightings were scored with
+    content_hash = db.Column(db.String(64), index=True)  # sha256 of the file
+    fingerprint = db.Column(db.String(128))  # perceptual hash of sampled frames, survives re-encoding
+    source_video_id = db.Column(db.Integer, db.ForeignKey("search_video.id"))  # earlier upload of the same footage
 
     # Relationships
     sightings = db.relationship("Sighting", backref="search_video", lazy=True)
+    checkpoints = db.relationship(
+        "VideoCheckpoint", backref="search_video", lazy=True, cascade="all, delete-orphan"
+    )
+    source_video = db.relationship("SearchVideo", remote_side=[id], backref="duplicates")
+
+    @property
+    def archive_video_id(self):
+        """Video whose face archive holds this footage: the original upload for known footage"""
+        return self.source_video_id or self.id
 
     def __repr__(self):
         safe_name = sanitize_input(self.video_name) if self.video_name else 'Unknown'
         return f"<SearchVideo {safe_name} for Case {self.case_id}>"
 
+    @property
+    def stats(self):
+        try:
+            return json.loads(self.analysis_stats) if self.analysis_stats else {}
+        except ValueError:
+            return {}
+
+
+class VideoCheckpoint(db.Model):
+    """Resume point of an interrupted analysis of a video, or of one segment of it"""
+    id = db.Column(db.Integer, primary_key=True)
+    search_video_id = db.Column(db.Integer, db.ForeignKey("search_video.id"), nullable=False)
+    segment_start = db.Column(db.Float, nullable=False, default=0.0)  # seconds, 0 for unsplit videos
+    next_frame = db.Column(db.Integer, nullable=False, default=0)  # frames before this are fully saved
+    last_frame = db.Column(db.Integer)  # last frame analyzed before the checkpoint
+    state = db.Column(db.Text)  # JSON string of counters carried over to the resumed run
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint("search_video_id", "segment_start"),)
+
+    def __repr__(self):
+        return f"<VideoCheckpoint video {self.search_video_id} @ frame {self.next_frame}>"
+
 
 class Sighting(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -147,8 +198,9 @@ class Sighting(db.Model):
         db.Integer, db.ForeignKey("search_video.id"), nullable=False
     )
     video_name = db.Column(db.String(100), nullable=False)
-    timestamp = db.Column(db.Float, nullable=False)  # timestamp in video (seconds)
-    confidence_score = db.Column(db.Float, nullable=False)  # combined confidence
+    timestamp = db.Column(db.Float, nullable=False)  # start of the sighting event in video (seconds)
+    end_timestamp = db.Column(db.Float)  # end of the sighting event in video (seconds)
+    confidence_score = db.Column(db.Float, nullable=False)  # peak confidence over the event
     face_score = db.Column(db.Float)
     clothing_score = db.Column(db.Float)
     detection_method = db.Column(
@@ -156,6 +208,7 @@ class Sighting(db.Model):
     )  # face, clothing, multi_modal
     thumbnail_path = db.Column(db.String(200))
     bounding_box = db.Column(db.Text)  # JSON string of coordinates
+    frame_scores = db.Column(db.LargeBinary)  # float32 (timestamp, confidence) rows for every matched frame
     verified = db.Column(db.Boolean, default=False)
     verified_by = db.Column(db.Integer, db.ForeignKey("user.id"))
     notes = db.Column(db.Text)
@@ -170,6 +223,18 @@ class Sighting(db.Model):
         seconds = int(self.timestamp % 60)
         return f"{minutes:02d}:{seconds:02d}"
 
+    @property
+    def duration(self):
+        if self.end_timestamp is None:
+            return 0.0
+        return self.end_timestamp - self.timestamp
+
+    @property
+    def score_series(self):
+        """Per-frame (timestamp, confidence) array behind this sighting event"""
+        from app.sighting_events import unpack_frame_scores
+        return unpack_frame_scores(self.frame_scores)
+
 
 class CaseNote(db.Model):
     id = db.Column(db.Integer, primary_key=True)
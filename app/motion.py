@@ -0,0 +1,93 @@
+"""
+Motion gating for static CCTV footage
+"""
+import cv2
+
+# Smallest region HOG can search: the 64x128 people window plus its default padding
+MIN_REGION_WIDTH = 96
+MIN_REGION_HEIGHT = 192
+
+
+class MotionGate:
+    """
+    Cheap background-subtraction gate in front of person detection.
+
+    Frames are compared on a small grayscale copy. ``regions(frame)``
+    returns the moving areas in full-resolution ``(x, y, w, h)``
+    coordinates, an empty list when nothing moved, or the whole frame
+    while the background model is still warming up.
+    """
+
+    def __init__(self, min_area_ratio=0.002, analysis_width=320, warmup_frames=3, full_frame_ratio=0.5):
+        self.min_area_ratio = min_area_ratio
+        self.analysis_width = analysis_width
+        self.warmup_frames = warmup_frames
+        self.full_frame_ratio = full_frame_ratio
+        self.subtractor = cv2.createBackgroundSubtractorMOG2(history=100, varThreshold=32, detectShadows=False)
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+        self.frames_seen = 0
+
+    def regions(self, frame):
+        frame_h, frame_w = frame.shape[:2]
+        scale = min(1.0, self.analysis_width / frame_w)
+        small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else frame
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+        mask = self.subtractor.apply(gray)
+        self.frames_seen += 1
+        if self.frames_seen <= self.warmup_frames:
+            return [(0, 0, frame_w, frame_h)]
+
+        _, mask = cv2.threshold(mask, 127, 255, cv2.THRESH_BINARY)
+        mask = cv2.dilate(cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel), self.kernel, iterations=2)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        min_area = self.min_area_ratio * mask.shape[0] * mask.shape[1]
+        boxes = []
+        for contour in contours:
+            if cv2.contourArea(contour) < min_area:
+                continue
+            x, y, w, h = cv2.boundingRect(contour)
+            boxes.append(self._expand((x / scale, y / scale, w / scale, h / scale), frame_w, frame_h))
+        if not boxes:
+            return []
+
+        boxes = merge_overlapping(boxes)
+        if sum(w * h for (_, _, w, h) in boxes) >= self.full_frame_ratio * frame_w * frame_h:
+            return [(0, 0, frame_w, frame_h)]
+        return boxes
+
+    @staticmethod
+    def _expand(box, frame_w, frame_h):
+        """Pad a motion blob so a whole person fits around it, clipped to the frame."""
+        x, y, w, h = box
+        w2, h2 = max(w * 1.5, MIN_REGION_WIDTH), max(h * 1.5, MIN_REGION_HEIGHT)
+        cx, cy = x + w / 2, y + h / 2
+        x0, y0 = max(0, int(cx - w2 / 2)), max(0, int(cy - h2 / 2))
+        x1, y1 = min(frame_w, int(cx + w2 / 2)), min(frame_h, int(cy + h2 / 2))
+        return (x0, y0, x1 - x0, y1 - y0)
+
+
+def merge_overlapping(boxes):
+    """Union overlapping (x, y, w, h) boxes until none overlap, so no area is searched twice."""
+    boxes = list(boxes)
+    merged = True
+    while merged:
+        merged = False
+        result = []
+        while boxes:
+            x, y, w, h = boxes.pop()
+            i = 0
+            while i < len(boxes):
+                bx, by, bw, bh = boxes[i]
+                if x < bx + bw and bx < x + w and y < by + bh and by < y + h:
+                    nx, ny = min(x, bx), min(y, by)
+                    w, h = max(x + w, bx + bw) - nx, max(y + h, by + bh) - ny
+                    x, y = nx, ny
+                    boxes.pop(i)
+                    merged = True
+                else:
+                    i += 1
+            result.append((x, y, w, h))
+        boxes = result
+    return boxes
@@ -0,0 +1,154 @@
+"""
+Shared analysis of one video for several cases
+"""
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+import cv2
+import numpy as np
+
+from app import db
+from app.vision_engine import FACE_MATCH_TOLERANCE, HOG_PROFILES, VisionProcessor, face_distance_matrix
+
+
+class MultiCaseProcessor:
+    """Match one video against the targets of many cases, decoding and encoding its faces once."""
+
+    def __init__(self, case_ids):
+        self.collectors = []
+        for case_id in case_ids:
+            collector = VisionProcessor(case_id)
+            if collector.has_targets:
+                self.collectors.append(collector)
+            else:
+                logging.warning(f"Case {case_id} has no usable target faces; left out of the shared analysis")
+        if not self.collectors:
+            raise ValueError("None of the cases has usable target faces")
+
+        target_encodings = [collector.target_encodings for collector in self.collectors]
+        # Column range of each case in the stacked target matrix
+        self.case_starts = np.cumsum([0] + [len(e) for e in target_encodings[:-1]])
+        # The shared detector runs the most thorough profile any of the cases asked for,
+        # and encodes every face: a clothing pre-filter for one case would hide people from the others
+        profiles = list(HOG_PROFILES)
+        self.settings = dict(
+            self.collectors[0].settings,
+            hog_profile=max((c.settings["hog_profile"] for c in self.collectors), key=profiles.index),
+            clothing_filter=None,
+        )
+        self.detector = VisionProcessor.for_worker(
+            self.collectors[0].case_id, np.vstack(target_encodings), self.settings
+        )
+
+    @property
+    def case_ids(self):
+        return [collector.case_id for collector in self.collectors]
+
+    def _case_confidences(self, observations):
+        """Best confidence per (observation, case), from the faces each observation was scored with."""
+        scores = np.zeros((len(observations), len(self.collectors)))
+        faces = [(i, encoding) for i, obs in enumerate(observations) for _, encoding in obs["faces"]]
+        if not faces:
+            return scores
+        distances = face_distance_matrix(
+            [encoding for _, encoding in faces], self.detector.target_encodings, self.detector.target_sq_norms
+        )
+        case_distances = np.minimum.reduceat(distances, self.case_starts, axis=1)
+        case_scores = np.where(case_distances <= FACE_MATCH_TOLERANCE, 1.0 - case_distances, 0.0)
+        for (i, _), row in zip(faces, case_scores):
+            scores[i] = np.maximum(scores[i], row)
+        return scores
+
+    def _dispatch(self, observations, frame_number, fps):
+        """Hand every case its own view of one frame's observations."""
+        if self.detector.tracker is not None:
+            # The detector's tracker only gates encodings; collectors keep their own tracks
+            self.detector.tracker.pop_finished(frame_number / fps)
+        scores = self._case_confidences(observations)
+        for c, collector in enumerate(self.collectors):
+            threshold = collector.settings["confidence_threshold"]
+            case_observations = [
+                dict(obs, confidence=float(scores[i, c]), roi=obs["roi"] if scores[i, c] > threshold else None, track_id=None)
+                for i, obs in enumerate(observations)
+            ]
+            collector._record_observations(case_observations, frame_number, fps, collector._current_video)
+
+    def run_video(self, video):
+        """Analyze ``video`` for every case, each on its own SearchVideo; returns per-case stats keyed by case id."""
+        from flask import current_app
+
+        from app.reprocessing import case_video, clear_video_sightings, remove_thumbnails
+
+        video_path = os.path.join('app', video.video_path)
+        if not os.path.exists(video_path):
+            raise FileNotFoundError(f"Video file not found: {video_path}")
+
+        videos = {collector.case_id: case_video(video, collector.case_id) for collector in self.collectors}
+        thumbnails = []
+        for case_row in videos.values():
+            thumbnails += clear_video_sightings(case_row)
+            case_row.status = "Processing"
+        db.session.commit()
+        remove_thumbnails(current_app.config.get('UPLOAD_FOLDER', 'app/static/uploads'), thumbnails)
+
+        try:
+            results = self._scan(video_path, videos)
+        except Exception:
+            db.session.rollback()
+            for case_row in videos.values():
+                case_row.status = "Failed"
+            db.session.commit()
+            raise
+
+        processed_at = datetime.now(timezone.utc)
+        for case_id, case_row in videos.items():
+            case_row.analysis_stats = json.dumps(results[case_id])
+            case_row.status = "Completed"
+            case_row.processed_at = processed_at
+        db.session.commit()
+        logging.info(f"Shared analysis of video {video.id} for cases {self.case_ids}: {results}")
+        return results
+
+    def _scan(self, video_path, videos):
+        """Decode the footage once and feed every collector; ``videos`` maps case ids to their SearchVideo."""
+        cap = cv2.VideoCapture(video_path)
+        pipeline = None
+        try:
+            if not cap.isOpened():
+                raise IOError(f"Could not open video file: {video_path}")
+
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            stats = {"frames_sampled": 0, "frames_gated": 0}
+            pipeline = self.detector._create_pipeline()
+            sampler = self.detector._create_sampler(cap, path=video_path)
+            frames = self.detector._gate_frames(sampler, stats)
+            for collector in self.collectors:
+                # Shared runs never resume from a checkpoint
+                collector._current_video = videos[collector.case_id]
+                collector._prior_sightings = 0
+                collector._start_video()
+
+            self.detector.tracker = self.detector._create_tracker()
+            if pipeline is not None:
+                def collect(frame_number, observations, counters):
+                    self.detector.counters.update(counters)
+                    observations = self.detector._apply_tracks(observations, self.detector.tracker, frame_number / fps)
+                    self._dispatch(observations, frame_number, fps)
+
+                pipeline.run(frames, collect)
+            else:
+                for frame_number, frame, regions in frames:
+                    observations = self.detector._analyze_frame(frame, regions, self.detector.tracker, frame_number / fps)
+                    self._dispatch(observations, frame_number, fps)
+
+            stats.update(self.detector.counters, frames_decoded=sampler.frames_decoded)
+            return {collector.case_id: dict(collector._finish_video(), **stats) for collector in self.collectors}
+
+        finally:
+            cap.release()
+            if pipeline is not None:
+                pipeline.close()
+            for collector in self.collectors:
+                collector._close_writer(videos[collector.case_id])
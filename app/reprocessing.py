@@ -0,0 +1,202 @@
+"""
+Bookkeeping for incremental case reprocessing
+"""
+import hashlib
+import json
+import os
+
+from app import db
+from app.face_archive import face_archive_path, remove_face_archive
+from app.face_index import get_face_index
+from app.models import Sighting
+
+# Settings that change which faces are found and encoded in a video
+DETECTION_SETTINGS = (
+    "face_backend",
+    "hog_profile",
+    "frame_source",
+    "decode_max_height",
+    "sample_rate",
+    "two_pass",
+    "coarse_sample_rate",
+    "refine_margin",
+    "face_mode",
+    "face_downscale",
+    "motion_gate",
+    "motion_min_area",
+    "tracking",
+    "track_iou",
+    "track_max_gap",
+    "track_quality_gain",
+    "track_encode_window",
+    "face_min_size",
+    "face_min_sharpness",
+    "face_max_yaw",
+    "clothing_filter",
+)
+# Settings that only change how the encoded faces are matched and grouped
+MATCH_SETTINGS = ("confidence_threshold", "event_max_gap")
+
+
+def _digest(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def detection_signature(settings):
+    return _digest({key: settings[key] for key in DETECTION_SETTINGS})
+
+
+def match_signature(settings, target_images):
+    targets = sorted((image.id, image.encoding_key or "") for image in target_images)
+    return _digest({"targets": targets, **{key: settings[key] for key in MATCH_SETTINGS}})
+
+
+def plan_video(video, detection, match, archive_folder):
+    """
+    Decide what a video needs for the current inputs:
+
+    - ``skip``: already analyzed with these targets and settings
+    - ``resume``: an analysis with these inputs was interrupted, continue it
+    - ``rescore``: only targets or thresholds changed, or the footage is a
+      known duplicate; re-match the face archive
+    - ``analyze``: decode and analyze from scratch
+    """
+    unchanged = video.detection_signature == detection and video.match_signature == match
+    if unchanged and video.status == "Completed":
+        return "skip"
+
+    owner = video.source_video or video
+    archived = (
+        owner.status == "Completed"
+        and owner.detection_signature == detection
+        and os.path.exists(face_archive_path(archive_folder, owner.id))
+    )
+    if archived and (video.source_video is not None or video.detection_signature == detection):
+        return "rescore"
+    return "resume" if unchanged else "analyze"
+
+
+def find_source_video(video, max_distance):
+    """
+    Find an analyzed earlier upload of the same footage: first by exact
+    content hash, then by perceptual fingerprint among videos of the same
+    length. Only originals are returned, never other duplicates.
+    """
+    from app.frame_sources import fingerprint_distance
+    from app.models import SearchVideo
+
+    originals = SearchVideo.query.filter(
+        SearchVideo.id != video.id,
+        SearchVideo.source_video_id.is_(None),
+        SearchVideo.status == "Completed",
+    )
+    if video.content_hash:
+        exact = originals.filter(SearchVideo.content_hash == video.content_hash).first()
+        if exact is not None:
+            return exact
+    if not video.fingerprint or not video.duration:
+        return None
+    candidates = originals.filter(
+        SearchVideo.fingerprint.isnot(None),
+        SearchVideo.duration.between(video.duration - 0.5, video.duration + 0.5),
+    )
+    best, best_distance = None, None
+    for candidate in candidates:
+        distance = fingerprint_distance(video.fingerprint, candidate.fingerprint)
+        if distance is not None and distance <= max_distance and (best is None or distance < best_distance):
+            best, best_distance = candidate, distance
+    return best
+
+
+def case_video(video, case_id):
+    """
+    The SearchVideo through which ``case_id`` owns the footage of ``video``:
+    the video itself for its own case, else that case's earlier upload or
+    shared-run row of the same footage, else a new row pointing at it as a
+    duplicate (added to the session, not committed).
+    """
+    from app.models import SearchVideo
+
+    if video.case_id == case_id:
+        return video
+    source_id = video.archive_video_id
+    existing = SearchVideo.query.filter(
+        SearchVideo.case_id == case_id,
+        db.or_(SearchVideo.id == source_id, SearchVideo.source_video_id == source_id),
+    ).first()
+    if existing is not None:
+        return existing
+    duplicate = SearchVideo(
+        case_id=case_id,
+        video_path=video.video_path,
+        video_name=video.video_name,
+        location=video.location,
+        duration=video.duration,
+        fps=video.fps,
+        resolution=video.resolution,
+        file_size=video.file_size,
+        content_hash=video.content_hash,
+        fingerprint=video.fingerprint,
+        source_video_id=source_id,
+    )
+    db.session.add(duplicate)
+    return duplicate
+
+
+def searched_case_ids(video):
+    """Cases that have analyzed, or are analyzing, the footage of ``video`` through a video of their own"""
+    from app.models import SearchVideo
+
+    source_id = video.archive_video_id
+    rows = db.session.query(SearchVideo.case_id).filter(
+        db.or_(SearchVideo.id == source_id, SearchVideo.source_video_id == source_id),
+        SearchVideo.status.in_(("Processing", "Completed")),
+    )
+    return {case_id for (case_id,) in rows.distinct()}
+
+
+def hand_over_duplicates(video):
+    """
+    Before ``video`` is deleted with its case, make its first duplicate in
+    another case the new original: the other duplicates are re-pointed at
+    it and it inherits the archive's detection signature. Returns the new
+    original, or None; the caller moves the archive file after committing.
+    """
+    heirs = [duplicate for duplicate in video.duplicates if duplicate.case_id != video.case_id]
+    if not heirs:
+        return None
+    heir = heirs[0]
+    heir.source_video = None
+    heir.detection_signature = video.detection_signature
+    for duplicate in heirs[1:]:
+        duplicate.source_video = heir
+    return heir
+
+
+def clear_video_sightings(video):
+    """Delete the sightings of an earlier analysis, keeping reviewer-verified ones; returns their thumbnails"""
+    stale = Sighting.query.filter_by(case_id=video.case_id, search_video_id=video.id, verified=False).all()
+    thumbnails = [os.path.basename(s.thumbnail_path) for s in stale if s.thumbnail_path]
+    for sighting in stale:
+        db.session.delete(sighting)
+    return thumbnails
+
+
+def reset_video(video, archive_folder):
+    """Drop everything an earlier analysis of a video produced so it starts over; returns stale thumbnails"""
+    thumbnails = clear_video_sightings(video)
+    video.checkpoints = []
+    video.source_video_id = None
+    video.status = "Pending"
+    video.analysis_stats = None
+    remove_face_archive(archive_folder, video.id)
+    get_face_index().delete(video.id)
+    return thumbnails
+
+
+def remove_thumbnails(upload_folder, filenames):
+    """Delete sighting thumbnails once the rows pointing at them are committed away"""
+    for filename in filenames:
+        path = os.path.join(upload_folder, filename)
+        if os.path.exists(path):
+            os.remove(path)
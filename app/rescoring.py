@@ -0,0 +1,129 @@
+"""
+Rescoring of analyzed videos from their face archives
+"""
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+import cv2
+import numpy as np
+
+from app import db
+from app.face_archive import face_archive_path, load_face_archive
+from app.frame_sources import decode_size, probe_video
+
+
+def rescore_video(processor, video):
+    """Re-match a video's archived faces against the current targets instead of decoding it; returns the final status"""
+    settings = processor.settings
+    try:
+        archive = load_face_archive(face_archive_path(settings["archive_folder"], video.archive_video_id))
+        if archive is None:
+            raise FileNotFoundError(f"No face archive for video {video.id}")
+        video.status = "Processing"
+        db.session.commit()
+
+        processor._current_video = video
+        processor._start_video()
+        scale = archive_box_scale(video, settings)
+        confidences = archive.match(processor.target_encodings, processor._score_encodings)
+        for matches, confidence, timestamp, box in archive_segments(archive, confidences, settings["confidence_threshold"]):
+            if scale is not None:
+                x, y, w, h = box
+                box = (int(x * scale[0]), int(y * scale[1]), int(w * scale[0]), int(h * scale[1]))
+            # The box stands in for the crop until the thumbnail frames are read
+            processor.events.add(matches, confidence, timestamp, box, box)
+        events = processor.events.pop_all()
+        read_thumbnails(video, events, settings)
+        for event in events:
+            if event.best_roi is not None:
+                processor._create_sighting(event, video)
+        processor.writer.flush()
+
+        stats = dict(video.stats, faces_rescored=len(archive), sightings=processor.writer.written)
+        video.analysis_stats = json.dumps(stats)
+        video.status = "Completed"
+        video.processed_at = datetime.now(timezone.utc)
+        db.session.commit()
+        logging.info(f"Rescored video {video.id} for case {processor.case_id}: {stats}")
+
+    except Exception:
+        logging.error(f"Failed to rescore video {video.id} for case {processor.case_id}", exc_info=True)
+        db.session.rollback()
+        video.status = "Failed"
+        db.session.commit()
+
+    finally:
+        processor._close_writer(video)
+    return video.status
+
+
+def analysis_size(video, settings):
+    """Size of the frames a video is analyzed at, which its archived boxes refer to; None if unknown"""
+    try:
+        width, height = (int(v) for v in video.resolution.split("x"))
+    except (AttributeError, ValueError):
+        info = probe_video(os.path.join('app', video.video_path))
+        if info is None:
+            return None
+        width, height = info["width"], info["height"]
+    if settings["frame_source"] == "ffmpeg":
+        return decode_size(width, height, settings["decode_max_height"])
+    return width, height
+
+
+def archive_box_scale(video, settings):
+    """``(x, y)`` factors mapping the source archive's boxes onto a duplicate's own frames; None if no scaling is needed"""
+    if video.source_video is None:
+        return None
+    source_size = analysis_size(video.source_video, settings)
+    own_size = analysis_size(video, settings)
+    if source_size is None or own_size is None or source_size == own_size:
+        return None
+    return own_size[0] / source_size[0], own_size[1] / source_size[1]
+
+
+def archive_segments(archive, confidences, threshold):
+    """Group scored archived faces per track, or per face, into segments whose best face passes the threshold"""
+    timestamps, track_ids, boxes = archive["timestamp"], archive["track_id"], archive["box"]
+    groups = {}
+    for i in np.flatnonzero(confidences > 0):
+        track_id = int(track_ids[i])
+        key = track_id if track_id >= 0 else (float(timestamps[i]), tuple(boxes[i]))
+        groups.setdefault(key, []).append(i)
+
+    for rows in groups.values():
+        # Several faces of one person in a frame count once, with the best score
+        by_time = {}
+        for i in rows:
+            timestamp = float(timestamps[i])
+            if confidences[i] > by_time.get(timestamp, (0.0, None))[0]:
+                by_time[timestamp] = (float(confidences[i]), tuple(int(v) for v in boxes[i]))
+        best_timestamp = max(by_time, key=lambda t: by_time[t][0])
+        best_confidence, best_box = by_time[best_timestamp]
+        if best_confidence > threshold:
+            matches = sorted((t, confidence) for t, (confidence, _) in by_time.items())
+            yield matches, best_confidence, best_timestamp, best_box
+
+
+def read_thumbnails(video, events, settings):
+    """Crop each event's thumbnail from its best frame, at the resolution its box was found in"""
+    cap = cv2.VideoCapture(os.path.join('app', video.video_path))
+    try:
+        for event in sorted(events, key=lambda e: e.peak_timestamp):
+            cap.set(cv2.CAP_PROP_POS_MSEC, event.peak_timestamp * 1000.0)
+            ret, frame = cap.read()
+            if not ret:
+                event.best_roi = None
+                continue
+            if settings["frame_source"] == "ffmpeg":
+                size = decode_size(frame.shape[1], frame.shape[0], settings["decode_max_height"])
+                if size != (frame.shape[1], frame.shape[0]):
+                    frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            x, y, w, h = event.best_box
+            roi = frame[max(0, y) : y + h, max(0, x) : x + w]
+            # A box outside the frame has nothing to show; its event is dropped
+            event.best_roi = roi if roi.size else None
+    finally:
+        cap.release()
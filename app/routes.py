@@ -83,6 +83,125 @@ def dashboard():
     return render_template('dashboard.html', user_stats=user_stats, recent_cases=recent_cases)
 
 
+def _save_target_photos(case, photo_files):
+    """Validate and store uploaded photos of the missing person; returns the new TargetImage rows"""
+    target_images = []
+    for photo_file in photo_files:
+        if photo_file and photo_file.filename != "":
+            # Validate file type
+            if not _is_allowed_image_file(photo_file.filename):
+                flash(f"Invalid image file type: {photo_file.filename}", "error")
+                continue
+
+            # Create secure unique filename
+            from app.utils import sanitize_filename
+            original_filename = sanitize_filename(photo_file.filename)
+            if not original_filename:
+                flash("Invalid filename", "error")
+                continue
+
+            # Generate unique filename to prevent conflicts
+            from app.utils import create_safe_filename
+            file_ext = original_filename.rsplit('.', 1)[1].lower() if '.' in original_filename else 'jpg'
+            unique_filename = create_safe_filename(f"case_{case.id}_photo", file_ext)
+
+            # Ensure uploads directory exists
+            upload_dir = os.path.join("app", "static", "uploads")
+            os.makedirs(upload_dir, exist_ok=True)
+
+            save_path = os.path.join(upload_dir, unique_filename)
+
+            # Validate file size (already handled by Flask config, but double-check)
+            photo_file.seek(0, 2)  # Seek to end
+            file_size = photo_file.tell()
+            photo_file.seek(0)  # Reset to beginning
+
+            if file_size > 16 * 1024 * 1024:  # 16MB limit
+                flash(f"File too large: {original_filename}", "error")
+                continue
+
+            photo_file.save(save_path)
+
+            # Validate file content after upload
+            from app.utils import validate_file_content
+            if not validate_file_content(save_path, 'image'):
+                os.remove(save_path)  # Remove invalid file
+                flash(f"Invalid image file content: {original_filename}", "error")
+                continue
+
+            db_path = os.path.join("static", "uploads", unique_filename).replace("\\", "/")
+            target_image = TargetImage(case_id=case.id, image_path=db_path)
+            db.session.add(target_image)
+            target_images.append(target_image)
+    return target_images
+
+
+def _save_search_video(case, video_file):
+    """Validate and store an uploaded search video; returns the new SearchVideo row or None"""
+    if video_file and video_file.filename != "":
+        # Validate file type
+        if not _is_allowed_video_file(video_file.filename):
+            flash(f"Invalid video file type: {video_file.filename}", "error")
+        else:
+            # Create secure unique filename
+            from app.utils import sanitize_filename
+            original_filename = sanitize_filename(video_file.filename)
+            if not original_filename:
+                flash("Invalid video filename", "error")
+            else:
+                # Generate unique filename to prevent conflicts
+                from app.utils import create_safe_filename
+                file_ext = original_filename.rsplit('.', 1)[1].lower() if '.' in original_filename else 'mp4'
+                unique_filename = create_safe_filename(f"case_{case.id}_video", file_ext)
+
+                upload_dir = os.path.join("app", "static", "uploads")
+                os.makedirs(upload_dir, exist_ok=True)
+
+                save_path = os.path.join(upload_dir, unique_filename)
+
+                # Validate file size
+                video_file.seek(0, 2)
+                file_size = video_file.tell()
+                video_file.seek(0)
+
+                if file_size > 100 * 1024 * 1024:  # 100MB limit for videos
+                    flash(f"Video file too large: {original_filename}", "error")
+                else:
+                    video_file.save(save_path)
+
+                    # Validate file content after upload
+                    from app.utils import validate_file_content
+                    if not validate_file_content(save_path, 'video'):
+                        os.remove(save_path)  # Remove invalid file
+                        flash(f"Invalid video file content: {original_filename}", "error")
+                    else:
+                        db_path = os.path.join("static", "uploads", unique_filename).replace("\\", "/")
+                        search_video = SearchVideo(case_id=case.id, video_path=db_path, video_name=original_filename)
+                        db.session.add(search_video)
+                        return search_video
+    return None
+
+
+def _queue_case_processing(case_id, target_images=(), videos=()):
+    """
+    Start (re)analysis of a case, encoding any new photos and fingerprinting
+    any new videos first so the video tasks start with their inputs ready
+    """
+    from celery import chain, group
+    from app.tasks import ingest_search_video, prepare_target_image, process_case, search_face_index
+    if target_images or videos:
+        chain(
+            group(
+                [prepare_target_image.si(image.id) for image in target_images]
+                + [ingest_search_video.si(video.id) for video in videos]
+            ),
+            search_face_index.si(case_id),
+            process_case.si(case_id),
+        ).delay()
+    else:
+        process_case.delay(case_id)
+
+
 @bp.route("/register_case", methods=["GET", "POST"])
 @login_required
 def register_case():
@@ -109,103 +228,11 @@ def register_case():
         db.session.add(new_case)
         db.session.commit()
 
-        # Handle multiple photo uploads with enhanced security
-        photo_files = request.files.getlist("photos")
-        for photo_file in photo_files:
-            if photo_file and photo_file.filename != "":
-                # Validate file type
-                if not _is_allowed_image_file(photo_file.filename):
-                    flash(f"Invalid image file type: {photo_file.filename}", "error")
-                    continue
-                
-                # Create secure unique filename
-                from app.utils import sanitize_filename
-                original_filename = sanitize_filename(photo_file.filename)
-                if not original_filename:
-                    flash("Invalid filename", "error")
-                    continue
-                
-                # Generate unique filename to prevent conflicts
-                from app.utils import create_safe_filename
-                file_ext = original_filename.rsplit('.', 1)[1].lower() if '.' in original_filename else 'jpg'
-                unique_filename = create_safe_filename(f"case_{new_case.id}_photo", file_ext)
-                
-                # Ensure uploads directory exists
-                upload_dir = os.path.join("app", "static", "uploads")
-                os.makedirs(upload_dir, exist_ok=True)
-                
-                save_path = os.path.join(upload_dir, unique_filename)
-                
-                # Validate file size (already handled by Flask config, but double-check)
-                photo_file.seek(0, 2)  # Seek to end
-                file_size = photo_file.tell()
-                photo_file.seek(0)  # Reset to beginning
-                
-                if file_size > 16 * 1024 * 1024:  # 16MB limit
-                    flash(f"File too large: {original_filename}", "error")
-                    continue
-                
-                photo_file.save(save_path)
-                
-                # Validate file content after upload
-                from app.utils import validate_file_content
-                if not validate_file_content(save_path, 'image'):
-                    os.remove(save_path)  # Remove invalid file
-                    flash(f"Invalid image file content: {original_filename}", "error")
-                    continue
-                
-                db_path = os.path.join("static", "uploads", unique_filename).replace("\\", "/")
-                target_image = TargetImage(case_id=new_case.id, image_path=db_path)
-                db.session.add(target_image)
-
-        # Handle optional video upload with enhanced security
-        video_file = form.video.data
-        if video_file and video_file.filename != "":
-            # Validate file type
-            if not _is_allowed_video_file(video_file.filename):
-                flash(f"Invalid video file type: {video_file.filename}", "error")
-            else:
-                # Create secure unique filename
-                from app.utils import sanitize_filename
-                original_filename = sanitize_filename(video_file.filename)
-                if not original_filename:
-                    flash("Invalid video filename", "error")
-                else:
-                    # Generate unique filename to prevent conflicts
-                    from app.utils import create_safe_filename
-                    file_ext = original_filename.rsplit('.', 1)[1].lower() if '.' in original_filename else 'mp4'
-                    unique_filename = create_safe_filename(f"case_{new_case.id}_video", file_ext)
-                    
-                    upload_dir = os.path.join("app", "static", "uploads")
-                    os.makedirs(upload_dir, exist_ok=True)
-                    
-                    save_path = os.path.join(upload_dir, unique_filename)
-                    
-                    # Validate file size
-                    video_file.seek(0, 2)
-                    file_size = video_file.tell()
-                    video_file.seek(0)
-                    
-                    if file_size > 100 * 1024 * 1024:  # 100MB limit for videos
-                        flash(f"Video file too large: {original_filename}", "error")
-                    else:
-                        video_file.save(save_path)
-                        
-                        # Validate file content after upload
-                        from app.utils import validate_file_content
-                        if not validate_file_content(save_path, 'video'):
-                            os.remove(save_path)  # Remove invalid file
-                            flash(f"Invalid video file content: {original_filename}", "error")
-                        else:
-                            db_path = os.path.join("static", "uploads", unique_filename).replace("\\", "/")
-                            search_video = SearchVideo(case_id=new_case.id, video_path=db_path, video_name=original_filename)
-                            db.session.add(search_video)
-
+        target_images = _save_target_photos(new_case, request.files.getlist("photos"))
+        search_video = _save_search_video(new_case, form.video.data)
         db.session.commit()
 
-        # Process the case with AI
-        from app.tasks import process_case
-        process_case.delay(new_case.id)
+        _queue_case_processing(new_case.id, target_images, [search_video] if search_video else [])
 
         flash("Missing person case has been successfully registered and is now being processed by our AI system!", "success")
         return redirect(url_for("main.profile"))
@@ -322,6 +349,31 @@ def withdraw_case(case_id):
     
     return redirect(url_for("main.dashboard"))
 
+@bp.route("/case/<int:case_id>/add_media", methods=["POST"])
+@login_required
+@case_owner_required
+def add_case_media(case_id):
+    """Add photos or search videos to an existing case; only what changed is analyzed again"""
+    case = Case.query.get_or_404(case_id)
+
+    if case.status in ['Resolved', 'Withdrawn']:
+        flash(f"Cannot add files to a case that is {case.status.lower()}.", "warning")
+        return redirect(url_for("main.case_details", case_id=case_id))
+
+    target_images = _save_target_photos(case, request.files.getlist("photos"))
+    videos = [_save_search_video(case, video_file) for video_file in request.files.getlist("videos")]
+    videos = [video for video in videos if video]
+    if not target_images and not videos:
+        flash("No valid photos or videos were uploaded.", "warning")
+        return redirect(url_for("main.case_details", case_id=case_id))
+
+    case.status = "Queued"
+    db.session.commit()
+    _queue_case_processing(case.id, target_images, videos)
+
+    flash(f"Added {len(target_images)} photo(s) and {len(videos)} video(s). The case is being updated.", "success")
+    return redirect(url_for("main.case_details", case_id=case_id))
+
 @bp.route("/case_status/<int:case_id>")
 @login_required
 @case_owner_required
@@ -336,6 +388,7 @@ def case_status(case_id):
             {
                 "video_name": video_name,
                 "timestamp": s.timestamp,
+                "end_timestamp": s.end_timestamp,
                 "confidence_score": round(s.confidence_score, 2),
                 "thumbnail_path": url_for(
                     "static", filename=s.thumbnail_path.replace("static\\", "/")
@@ -0,0 +1,118 @@
+"""
+Temporal clustering of face matches into sighting events
+"""
+import numpy as np
+
+# Raw per-frame scores are stored as float32 (timestamp, confidence) rows
+SCORE_DTYPE = np.float32
+
+
+def pack_frame_scores(matches):
+    return np.asarray(matches, dtype=SCORE_DTYPE).reshape(-1, 2).tobytes()
+
+
+def unpack_frame_scores(blob):
+    """Return an (n, 2) array of (timestamp, confidence) rows"""
+    if not blob:
+        return np.empty((0, 2), dtype=SCORE_DTYPE)
+    return np.frombuffer(blob, dtype=SCORE_DTYPE).reshape(-1, 2)
+
+
+def merge_adjacent_sightings(sightings, max_gap):
+    """
+    Merge Sighting rows (sorted by start) that overlap or lie within
+    ``max_gap`` seconds of each other, as the event builder would have
+    done in a single pass. The row with the higher peak is kept and
+    widened; returns the rows that became redundant.
+    """
+    removed = []
+    current = None
+    for sighting in sightings:
+        if current is not None and sighting.timestamp - (current.end_timestamp or current.timestamp) <= max_gap:
+            keep, drop = (current, sighting) if current.confidence_score >= sighting.confidence_score else (sighting, current)
+            ends = [t for t in (current.end_timestamp, sighting.end_timestamp) if t is not None]
+            keep.timestamp = min(current.timestamp, sighting.timestamp)
+            keep.end_timestamp = max(ends) if ends else None
+            scores = np.vstack([unpack_frame_scores(current.frame_scores), unpack_frame_scores(sighting.frame_scores)])
+            # Frames in the overlap were scored twice; keep one row per timestamp
+            scores = scores[np.lexsort((-scores[:, 1], scores[:, 0]))]
+            _, first = np.unique(scores[:, 0], return_index=True)
+            keep.frame_scores = scores[first].tobytes()
+            removed.append(drop)
+            current = keep
+        else:
+            current = sighting
+    return removed
+
+
+class SightingEvent:
+    """A run of matches of the same target close together in time"""
+
+    def __init__(self, method):
+        self.method = method
+        self.start = None
+        self.end = None
+        self.matches = []
+        self.peak_confidence = 0.0
+        self.peak_timestamp = None
+        self.best_box = None
+        self.best_roi = None
+
+    def merge(self, matches, best_confidence, best_timestamp, best_box, best_roi):
+        self.matches.extend(matches)
+        times = [t for t, _ in matches]
+        self.start = min(times) if self.start is None else min(self.start, min(times))
+        self.end = max(times) if self.end is None else max(self.end, max(times))
+        if best_confidence > self.peak_confidence and best_roi is not None:
+            self.peak_confidence = best_confidence
+            self.peak_timestamp = best_timestamp
+            self.best_box = best_box
+            self.best_roi = best_roi
+
+    @property
+    def frame_scores(self):
+        return pack_frame_scores(sorted(self.matches))
+
+
+class SightingEventBuilder:
+    """
+    Merge match segments (single frames or whole tracks) into events.
+
+    Segments whose time spans overlap or are separated by at most
+    ``max_gap`` seconds end up in the same event. Segments may arrive out
+    of order (a long track finishes after short ones that started later),
+    so events are only released by ``pop_closed(horizon)`` once no future
+    segment can start before ``event.end + max_gap``.
+    """
+
+    def __init__(self, max_gap=5.0, method="face"):
+        self.max_gap = max_gap
+        self.method = method
+        self.events = []
+
+    def add(self, matches, best_confidence, best_timestamp, best_box, best_roi):
+        if not matches:
+            return
+        start = min(t for t, _ in matches)
+        end = max(t for t, _ in matches)
+
+        # Absorb every open event this segment touches
+        touching = [e for e in self.events if start - self.max_gap <= e.end and e.start <= end + self.max_gap]
+        event = SightingEvent(self.method)
+        for other in touching:
+            event.merge(other.matches, other.peak_confidence, other.peak_timestamp, other.best_box, other.best_roi)
+            self.events.remove(other)
+        event.merge(matches, best_confidence, best_timestamp, best_box, best_roi)
+        self.events.append(event)
+
+    def pop_closed(self, horizon):
+        """Release events that no segment starting at or after ``horizon`` can extend"""
+        closed = [e for e in self.events if e.end + self.max_gap < horizon]
+        for event in closed:
+            self.events.remove(event)
+        return sorted(closed, key=lambda e: e.start)
+
+    def pop_all(self):
+        closed = sorted(self.events, key=lambda e: e.start)
+        self.events = []
+        return closed
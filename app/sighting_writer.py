@@ -0,0 +1,111 @@
+"""
+Buffered, transactional sighting persistence
+"""
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from app import db
+from app.models import Sighting
+
+
+def write_thumbnail(path, image):
+    """
+    Write a JPEG atomically: encode, write to a temp file, fsync, rename.
+
+    A reader (or a crash) never observes a partially written thumbnail.
+    """
+    ok, buffer = cv2.imencode(".jpg", image)
+    if not ok:
+        return False
+    tmp_path = path + ".part"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(buffer.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return True
+    except OSError:
+        logging.error(f"Failed to write thumbnail {path}", exc_info=True)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+
+class SightingWriter:
+    """
+    Collect sighting rows and insert them in batches.
+
+    Thumbnails are written by a small thread pool as soon as a sighting is
+    added, off the analysis loop. Rows are inserted with one bulk INSERT
+    and a single commit when ``batch_size`` rows are pending or
+    ``flush_interval`` seconds have passed. A row is only inserted after
+    its thumbnail is fully on disk, so a crash can leave an orphaned
+    thumbnail (removed by cleanup_orphaned_files) but never a row without
+    its file. ``before_commit`` is called inside each batch transaction,
+    so the caller can stage related changes (a checkpoint) atomically.
+    """
+
+    def __init__(self, upload_folder, batch_size=50, flush_interval=10.0, thumbnail_threads=2, before_commit=None):
+        self.upload_folder = upload_folder
+        self.before_commit = before_commit
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.executor = ThreadPoolExecutor(max_workers=thumbnail_threads)
+        self.pending = []
+        self.last_flush = time.monotonic()
+        self.written = 0
+
+    def add(self, row, thumbnail, filename):
+        """Queue a sighting row; its thumbnail is saved as ``filename`` in the upload folder"""
+        path = os.path.join(self.upload_folder, filename)
+        if not os.path.abspath(path).startswith(os.path.abspath(self.upload_folder)):
+            logging.error(f"Invalid thumbnail path for case {row.get('case_id')}")
+            return
+        future = self.executor.submit(write_thumbnail, path, thumbnail)
+        self.pending.append((row, future, path))
+
+    def flush_if_due(self):
+        if len(self.pending) >= self.batch_size or (
+            self.pending and time.monotonic() - self.last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self):
+        """Wait for pending thumbnails, then insert their rows in one transaction"""
+        batch, self.pending = self.pending, []
+        self.last_flush = time.monotonic()
+
+        rows, paths = [], []
+        for row, future, path in batch:
+            if future.result():
+                rows.append(row)
+                paths.append(path)
+            else:
+                logging.error(f"Dropping sighting for case {row['case_id']}: thumbnail could not be saved")
+        if not rows:
+            return
+
+        try:
+            db.session.execute(db.insert(Sighting), rows)
+            if self.before_commit is not None:
+                self.before_commit()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+        self.written += len(rows)
+        logging.info(f"Saved {len(rows)} sightings for case {rows[0]['case_id']}")
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.executor.shutdown(wait=True)
@@ -1,11 +1,13 @@
+import json
 import logging
+import os
 import traceback
 from datetime import datetime
 
-from celery import Celery
+from celery import Celery, chord
 
 from app import create_app, db
-from app.models import Case, SystemLog
+from app.models import Case, Notification, SearchVideo, Sighting, SystemLog, TargetImage, VideoCheckpoint
 from app.vision_engine import VisionProcessor
 
 # We don't create the app here anymore to prevent circular imports.
@@ -15,6 +17,7 @@ celery = Celery(__name__)
 
 @celery.task
 def process_case(case_id):
+    """Start analysis of a case: one process_video subtask per video, then finalize_case"""
     # Create a new app instance for this task to ensure a clean context.
     app = create_app()
     with app.app_context():
@@ -26,11 +29,8 @@ def process_case(case_id):
             return
 
         try:
-            # Update case status to 'Processing'
+            # Update case status to 'Processing' and log the start in one transaction
             case.status = "Processing"
-            db.session.commit()
-
-            # Log the start of processing
             log_start = SystemLog(
                 case_id=case_id,
                 action="case_processing_started",
@@ -39,53 +39,471 @@ def process_case(case_id):
             db.session.add(log_start)
             db.session.commit()
 
-            # Run the main AI analysis
+            # Loads (and caches) the target encodings once, before the fan-out
             processor = VisionProcessor(case_id)
-            processor.run_analysis()
+            if not processor.has_targets:
+                finalize_case.delay([], case_id)
+                return
 
-            # Update case status to 'Completed'
-            case.status = "Completed"
-            case.completed_at = datetime.utcnow()
+            subtasks = _plan_case_videos(app, case, processor)
+            if not subtasks:
+                finalize_case.delay([], case_id)
+                return
+
+            # Spread the videos across the worker fleet; the callback runs once all are done
+            chord(subtasks)(finalize_case.s(case_id).on_error(case_processing_failed.s(case_id)))
+
+        except Exception as e:
+            _record_case_failure(case, case_id, e)
+            # Re-raise the original exception so Celery knows the task failed
+            raise e
+
+
+# A killed worker's task is redelivered (acks_late) and a failed scan is retried;
+# both resume from the video's last checkpoint instead of frame 0
+VIDEO_TASK_OPTIONS = dict(bind=True, acks_late=True, reject_on_worker_lost=True, max_retries=2, default_retry_delay=30)
+
+
+@celery.task(**VIDEO_TASK_OPTIONS)
+def process_video(self, case_id, video_id):
+    """Analyze one SearchVideo of a case, splitting long videos into segment subtasks"""
+    app = create_app()
+    with app.app_context():
+        video = SearchVideo.query.get(video_id)
+        if not video or video.case_id != case_id:
+            logging.error(f"Task failed: SearchVideo {video_id} not found for case {case_id}.")
+            return {"video_id": video_id, "status": "Missing"}
+        if video.status == "Completed":
+            return {"video_id": video_id, "status": video.status}
+
+        segments = _plan_video_segments(app, video)
+        if len(segments) > 1:
+            video.status = "Processing"
+            db.session.commit()
+            logging.info(f"Splitting video {video_id} of case {case_id} into {len(segments)} segments")
+            # The segment chord takes this task's place in the case chord
+            raise self.replace(chord(
+                [process_video_segment.s(case_id, video_id, start, end) for start, end in segments],
+                finalize_video.s(case_id, video_id),
+            ))
+
+        processor = VisionProcessor(case_id)
+        status = processor.run_video(video)
+        if status == "Failed" and self.request.retries < self.max_retries:
+            raise self.retry()
+        if status == "Completed":
+            index_video_faces.delay(video_id)
+        return {"video_id": video_id, "status": status}
+
+
+def _plan_video_segments(app, video):
+    """Fill in missing video metadata and plan the time segments to analyze"""
+    from app.frame_sources import plan_segments, probe_video
+
+    if not video.duration or not video.fps:
+        video_path = os.path.join('app', video.video_path)
+        info = probe_video(video_path) if os.path.exists(video_path) else None
+        if info:
+            video.fps = info["fps"] or None
+            video.duration = info["duration"]
+            video.resolution = f"{info['width']}x{info['height']}"
+            video.file_size = os.path.getsize(video_path)
+            db.session.commit()
+
+    return plan_segments(
+        video.duration,
+        video.fps,
+        app.config.get("VISION_CHUNK_FRAMES", 27000),
+        app.config.get("VISION_CHUNK_MIN_SECONDS", 120.0),
+        app.config.get("VISION_CHUNK_OVERLAP", 10.0),
+    )
+
+
+@celery.task(**VIDEO_TASK_OPTIONS)
+def process_video_segment(self, case_id, video_id, start_time, end_time):
+    """Analyze one time segment of a long SearchVideo"""
+    app = create_app()
+    with app.app_context():
+        video = SearchVideo.query.get(video_id)
+        if not video or video.case_id != case_id:
+            logging.error(f"Task failed: SearchVideo {video_id} not found for case {case_id}.")
+            return {"status": "Missing"}
+
+        try:
+            processor = VisionProcessor(case_id)
+            stats = processor.run_segment(video, start_time, end_time)
+            return {"status": "Completed", "stats": stats, "segment_start": start_time}
+        except Exception:
+            db.session.rollback()
+            logging.error(f"Failed to analyze video {video_id} from {start_time:.0f}s", exc_info=True)
+            if self.request.retries < self.max_retries:
+                raise self.retry()
+            return {"status": "Failed"}
+
+
+@celery.task
+def finalize_video(results, case_id, video_id):
+    """Segment chord callback: merge sightings split at segment boundaries and close the video"""
+    app = create_app()
+    with app.app_context():
+        video = SearchVideo.query.get(video_id)
+        if not video:
+            return {"video_id": video_id, "status": "Missing"}
+
+        from app.face_archive import merge_face_archive_parts, remove_face_archive
+        from app.reprocessing import remove_thumbnails
+        from app.sighting_events import merge_adjacent_sightings
+
+        # Each segment re-reads the tail of the previous one, so a person seen
+        # across a boundary was written once by each side
+        sightings = (
+            Sighting.query.filter_by(case_id=case_id, search_video_id=video_id)
+            .order_by(Sighting.timestamp)
+            .all()
+        )
+        # Reviewer-verified sightings survive reprocessing: never merged away or widened
+        duplicates = merge_adjacent_sightings(
+            [s for s in sightings if not s.verified], app.config.get("VISION_EVENT_MAX_GAP", 5.0)
+        )
+        thumbnails = [os.path.basename(s.thumbnail_path) for s in duplicates if s.thumbnail_path]
+        for sighting in duplicates:
+            db.session.delete(sighting)
+
+        stats = {"segments": len(results)}
+        for result in results:
+            for key, value in (result.get("stats") or {}).items():
+                stats[key] = stats.get(key, 0) + value
+        stats["sightings"] = len(sightings) - len(duplicates)
+
+        completed = all(r.get("status") == "Completed" for r in results)
+        archive_folder = app.config.get("VISION_ARCHIVE_FOLDER", "face_archives")
+        if completed:
+            VideoCheckpoint.query.filter_by(search_video_id=video_id).delete()
+            if merge_face_archive_parts(archive_folder, video_id, [r["segment_start"] for r in results]):
+                index_video_faces.delay(video_id)
+        else:
+            remove_face_archive(archive_folder, video_id)
+        video.analysis_stats = json.dumps(stats)
+        video.status = "Completed" if completed else "Failed"
+        video.processed_at = datetime.utcnow()
+        db.session.commit()
+
+        remove_thumbnails(app.config.get('UPLOAD_FOLDER', 'app/static/uploads'), thumbnails)
+
+        logging.info(f"Merged {len(duplicates)} boundary sightings for video {video_id}: {stats}")
+        return {"video_id": video_id, "status": video.status}
+
+
+def _plan_case_videos(app, case, processor):
+    """
+    Compare each video's recorded inputs with the current ones and return
+    the subtasks needed: nothing for videos already analyzed with the same
+    targets and settings, a rescore of the face archive when only targets
+    or thresholds changed, and a full analysis otherwise.
+    """
+    from app.reprocessing import (
+        clear_video_sightings,
+        detection_signature,
+        match_signature,
+        plan_video,
+        remove_thumbnails,
+        reset_video,
+    )
+
+    archive_folder = processor.settings["archive_folder"]
+    detection = detection_signature(processor.settings)
+    match = match_signature(processor.settings, case.target_images)
+
+    subtasks, thumbnails, planned = [], [], {}
+    for video in case.search_videos:
+        action = plan_video(video, detection, match, archive_folder)
+        planned[action] = planned.get(action, 0) + 1
+        if action == "skip":
+            continue
+        if action == "analyze":
+            thumbnails += reset_video(video, archive_folder)
+        elif action == "rescore":
+            thumbnails += clear_video_sightings(video)
+        video.detection_signature = detection
+        video.match_signature = match
+        task = rescore_video if action == "rescore" else process_video
+        subtasks.append(task.s(case.id, video.id))
+    db.session.commit()
+    remove_thumbnails(app.config.get('UPLOAD_FOLDER', 'app/static/uploads'), thumbnails)
+
+    logging.info(f"Video plan for case {case.id}: {planned}")
+    return subtasks
+
+
+@celery.task
+def rescore_video(case_id, video_id):
+    """Re-match the archived faces of an analyzed video against the case's current targets"""
+    app = create_app()
+    with app.app_context():
+        video = SearchVideo.query.get(video_id)
+        if not video or video.case_id != case_id:
+            logging.error(f"Task failed: SearchVideo {video_id} not found for case {case_id}.")
+            return {"video_id": video_id, "status": "Missing"}
+
+        from app.rescoring import rescore_video as rescore_archive
+
+        status = rescore_archive(VisionProcessor(case_id), video)
+        return {"video_id": video_id, "status": status}
+
+
+@celery.task
+def index_video_faces(video_id):
+    """Add a video's archived faces to the cross-case face index"""
+    app = create_app()
+    with app.app_context():
+        from app.face_archive import archived_video_ids, face_archive_path, load_face_archive
+        from app.face_index import get_face_index
+
+        archive_folder = app.config.get("VISION_ARCHIVE_FOLDER", "face_archives")
+        archive = load_face_archive(face_archive_path(archive_folder, video_id))
+        if archive is None:
+            return 0
+
+        index = get_face_index()
+        index.add(video_id, archive["encoding"])
+        if index.needs_training:
+            # The quantizer was trained on far fewer faces than are indexed now
+            def archived_videos():
+                for archived_id in archived_video_ids(archive_folder):
+                    archived = load_face_archive(face_archive_path(archive_folder, archived_id))
+                    if archived is not None:
+                        yield archived_id, archived["encoding"]
+
+            index.rebuild(archived_videos)
+            logging.info(f"Rebuilt face index over {len(index.video_ids)} videos")
+        return len(archive)
+
+
+@celery.task
+def search_face_index(case_id):
+    """Look a new case's targets up in all footage already analyzed and tell admins about matches"""
+    app = create_app()
+    with app.app_context():
+        try:
+            case = Case.query.get(case_id)
+            if not case:
+                return 0
+            processor = VisionProcessor(case_id)
+            if not processor.has_targets:
+                return 0
+
+            own_videos = {video.id for video in case.search_videos}
+            hits = [hit for hit in processor.search_index() if hit[0] not in own_videos]
+            if not hits:
+                return 0
+
+            # Only admins read system logs; the footage may belong to other cases
+            best = {}
+            for video_id, timestamp, _, confidence in hits:
+                if confidence > best.get(video_id, (0.0, 0.0))[0]:
+                    best[video_id] = (confidence, timestamp)
+            details = "; ".join(
+                f"video {video_id} at {timestamp:.1f}s ({confidence:.2f})"
+                for video_id, (confidence, timestamp) in sorted(best.items(), key=lambda item: -item[1][0])
+            )
+            db.session.add(SystemLog(
+                case_id=case_id,
+                action="face_index_matches",
+                details=f"Possible matches in previously analyzed footage: {details}",
+            ))
             db.session.commit()
+            return len(best)
+        except Exception:
+            # Never block the case chain on the index lookup
+            db.session.rollback()
+            logging.error(f"Face index search failed for case {case_id}", exc_info=True)
+            return 0
+
+
+@celery.task
+def process_video_for_cases(video_id, case_ids):
+    """Decode one video once and match it against the targets of several cases"""
+    app = create_app()
+    with app.app_context():
+        video = SearchVideo.query.get(video_id)
+        if not video:
+            logging.error(f"Task failed: SearchVideo {video_id} not found.")
+            return {}
+
+        from app.multi_case import MultiCaseProcessor
+        try:
+            results = MultiCaseProcessor(case_ids).run_video(video)
+        except Exception:
+            db.session.rollback()
+            logging.error(f"Shared analysis of video {video_id} failed", exc_info=True)
+            return {}
 
-            # Log successful completion
+        for case_id, stats in results.items():
+            db.session.add(SystemLog(
+                case_id=case_id,
+                action="shared_video_analysis",
+                details=(
+                    f"Searched footage {video.video_name} (#{video.id}) together with {len(results) - 1} other cases: "
+                    f"{stats.get('sightings', 0)} sightings"
+                ),
+            ))
+        db.session.commit()
+        return {str(case_id): stats.get("sightings", 0) for case_id, stats in results.items()}
+
+
+@celery.task
+def finalize_case(results, case_id):
+    """Chord callback: mark the case completed and write the summary log"""
+    app = create_app()
+    with app.app_context():
+        case = Case.query.get(case_id)
+        if not case:
+            logging.error(f"Task failed: Case with ID {case_id} not found.")
+            return
+
+        try:
+            failed = [r["video_id"] for r in results if r and r.get("status") != "Completed"]
+            # Update case status to 'Completed' and log it in one transaction
+            case.status = "Completed"
+            case.completed_at = datetime.utcnow()
+            details = f"Successfully completed processing. Found {len(case.sightings)} sightings."
+            if failed:
+                details += f" {len(failed)} of {len(results)} videos could not be analyzed."
             log_complete = SystemLog(
                 case_id=case_id,
                 action="case_processing_completed",
-                details=f"Successfully completed processing. Found {len(case.sightings)} sightings.",
+                details=details,
             )
             db.session.add(log_complete)
             db.session.commit()
 
         except Exception as e:
-            # FIX 1: Roll back the failed transaction first. This is critical.
+            _record_case_failure(case, case_id, e)
+            raise e
+
+
+@celery.task
+def case_processing_failed(request, exc, tb, case_id):
+    """Chord error callback: a video subtask raised, so the case is marked as errored"""
+    app = create_app()
+    with app.app_context():
+        case = Case.query.get(case_id)
+        if case:
+            _record_case_failure(case, case_id, exc)
+
+
+def _record_case_failure(case, case_id, e):
+    # FIX 1: Roll back the failed transaction first. This is critical.
+    db.session.rollback()
+
+    # Now, safely update the database with the error status
+    try:
+        case.status = "Error"
+
+        error_details = f"Error processing case {case_id}: {str(e)}\n{traceback.format_exc()}"
+        log_error = SystemLog(
+            case_id=case_id,
+            action="case_processing_failed",
+            details=error_details,
+        )
+        db.session.add(log_error)
+        db.session.commit()
+
+    except Exception as db_error:
+        # FIX 2: Use proper logging instead of print().
+        from app.utils import sanitize_log_input
+        safe_case_id = sanitize_log_input(str(case_id))
+        safe_error = sanitize_log_input(str(e))
+        safe_db_error = sanitize_log_input(str(db_error))
+        logging.critical(f"CRITICAL: Failed to update database with error status for case {safe_case_id}.")
+        logging.critical(f"Original Error: {safe_error}")
+        logging.critical(f"DB Error: {safe_db_error}")
+
+
+@celery.task
+def prepare_target_image(target_image_id):
+    """Normalize and encode a freshly uploaded target photo ahead of video analysis"""
+    app = create_app()
+    with app.app_context():
+        target_image = TargetImage.query.get(target_image_id)
+        if not target_image:
+            logging.error(f"Task failed: TargetImage with ID {target_image_id} not found.")
+            return None
+
+        try:
+            from app.face_cache import analyze_target_image
+            face_count = analyze_target_image(target_image)
+        except Exception:
+            # Never fail the chord: process_case re-encodes anything left uncached
             db.session.rollback()
-            
-            # Now, safely update the database with the error status
-            try:
-                case.status = "Error"
-                
-                error_details = f"Error processing case {case_id}: {str(e)}\n{traceback.format_exc()}"
-                log_error = SystemLog(
-                    case_id=case_id,
-                    action="case_processing_failed",
-                    details=error_details,
-                )
-                db.session.add(log_error)
-                db.session.commit()
-
-            except Exception as db_error:
-                # FIX 2: Use proper logging instead of print().
-                from app.utils import sanitize_log_input
-                safe_case_id = sanitize_log_input(str(case_id))
-                safe_error = sanitize_log_input(str(e))
-                safe_db_error = sanitize_log_input(str(db_error))
-                logging.critical(f"CRITICAL: Failed to update database with error status for case {safe_case_id}.")
-                logging.critical(f"Original Error: {safe_error}")
-                logging.critical(f"DB Error: {safe_db_error}")
+            logging.error(f"Failed to prepare target image {target_image_id}", exc_info=True)
+            return None
 
-            # Re-raise the original exception so Celery knows the task failed
-            raise e
+        if face_count == 0:
+            case = target_image.case
+            db.session.add(SystemLog(
+                case_id=case.id,
+                action="target_image_no_face",
+                details=f"No face detected in target image {target_image.id}",
+            ))
+            db.session.add(Notification(
+                user_id=case.user_id,
+                title="Photo needs attention",
+                message=(
+                    f"We could not find a face in one of the photos for {case.person_name}. "
+                    "A clear, front-facing photo greatly improves search results."
+                ),
+                type="warning",
+            ))
+            db.session.commit()
+        return face_count
+
+
+@celery.task
+def ingest_search_video(video_id):
+    """
+    Fingerprint a freshly uploaded search video and link it to an earlier
+    upload of the same footage, whose face archive is then re-matched for
+    this case instead of decoding the video again. Sightings are still
+    written against this case's own video, so no case sees another's results.
+    """
+    app = create_app()
+    with app.app_context():
+        video = SearchVideo.query.get(video_id)
+        if not video:
+            logging.error(f"Task failed: SearchVideo with ID {video_id} not found.")
+            return None
+
+        try:
+            from app.face_cache import file_sha256
+            from app.frame_sources import probe_video, video_fingerprint
+            from app.reprocessing import find_source_video
+
+            video_path = os.path.join('app', video.video_path)
+            video.content_hash = file_sha256(video_path)
+            video.file_size = os.path.getsize(video_path)
+            info = probe_video(video_path)
+            if info:
+                video.fps = info["fps"] or None
+                video.duration = info["duration"]
+                video.resolution = f"{info['width']}x{info['height']}"
+            video.fingerprint = video_fingerprint(video_path)
+
+            source = find_source_video(video, app.config.get("VISION_DUPLICATE_MAX_DISTANCE", 6.0))
+            if source is not None:
+                video.source_video_id = source.id
+                db.session.add(SystemLog(
+                    case_id=video.case_id,
+                    action="duplicate_video_detected",
+                    details=f"Video {video.id} is known footage (video {source.id}); its face archive will be reused",
+                ))
+            db.session.commit()
+        except Exception:
+            # Never fail the chain: without a fingerprint the video is simply analyzed
+            db.session.rollback()
+            logging.error(f"Failed to fingerprint search video {video_id}", exc_info=True)
+            return None
+        return video.source_video_id
 
 
 @celery.task
@@ -100,6 +518,10 @@ def cleanup_files():
             orphaned_count = cleanup_orphaned_files()
             logging.info(f"Cleaned up {orphaned_count} orphaned files")
             
+            # Purge deleted videos from the face index
+            from app.face_index import get_face_index
+            get_face_index().compact()
+
             # Enforce storage limits
             removed_count = enforce_storage_limits()
             if removed_count > 0:
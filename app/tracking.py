@@ -0,0 +1,142 @@
+"""
+Lightweight person tracking across sampled frames
+"""
+
+
+def box_iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = min(ax + aw, bx + bw) - max(ax, bx)
+    ih = min(ay + ah, by + bh) - max(ay, by)
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter = iw * ih
+    return inter / float(aw * ah + bw * bh - inter)
+
+
+class Track:
+    """One person followed across frames, with the face evidence gathered for them"""
+
+    def __init__(self, track_id, box, timestamp):
+        self.track_id = track_id
+        self.box = box
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+
+        self.encoded_quality = None  # face quality at the last encoding, None = never encoded
+        self.encoded_at = None  # timestamp of the last encoding
+        self.confidence = 0.0  # confidence from the last encoding, carried to frames that skip encoding
+        self.faces = []  # (quality, encoding) of the faces behind that confidence
+        self.matches = []  # (timestamp, confidence) for every frame with a target match
+        self.best_confidence = 0.0
+        self.best_timestamp = None
+        self.best_box = None
+        self.best_roi = None
+
+    def needs_encoding(self, quality, quality_gain, timestamp=None, window=0.0):
+        """
+        Encode new tracks, and existing ones only when the face got noticeably
+        better, at most once per ``window`` seconds: a person slowly turning
+        to the camera is encoded once per window instead of on every frame.
+        """
+        if self.encoded_quality is None:
+            return True
+        if quality <= self.encoded_quality * quality_gain:
+            return False
+        return not window or timestamp is None or self.encoded_at is None or timestamp - self.encoded_at >= window
+
+    def record_encoding(self, quality, confidence, faces=(), timestamp=None):
+        self.encoded_quality = quality
+        self.encoded_at = timestamp
+        self.confidence = confidence
+        self.faces = list(faces)
+
+    def observe(self, timestamp, confidence, box, roi=None):
+        if confidence <= 0:
+            return
+        self.matches.append((timestamp, confidence))
+        if confidence > self.best_confidence:
+            self.best_confidence = confidence
+            self.best_timestamp = timestamp
+            self.best_box = box
+            self.best_roi = roi
+
+
+class PersonTracker:
+    """
+    Greedy IoU tracker with a centroid-distance fallback.
+
+    Boxes are matched to live tracks by descending IoU; boxes left over
+    are matched to a track whose centre is within half a box diagonal,
+    which covers people moving further than their width between samples.
+    Tracks not seen for ``max_gap`` seconds are finished.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_gap=2.0):
+        self.iou_threshold = iou_threshold
+        self.max_gap = max_gap
+        self.tracks = {}
+        self._next_id = 1
+
+    @property
+    def tracks_started(self):
+        return self._next_id - 1
+
+    def get(self, track_id):
+        return self.tracks.get(track_id)
+
+    def assign(self, boxes, timestamp):
+        """Return the Track for each box, creating tracks for unmatched boxes"""
+        live = list(self.tracks.values())
+        assigned = [None] * len(boxes)
+        used = set()
+
+        pairs = []
+        for i, box in enumerate(boxes):
+            for track in live:
+                iou = box_iou(box, track.box)
+                if iou >= self.iou_threshold:
+                    pairs.append((iou, i, track.track_id))
+        for _, i, track_id in sorted(pairs, reverse=True):
+            if assigned[i] is None and track_id not in used:
+                assigned[i] = self.tracks[track_id]
+                used.add(track_id)
+
+        for i, box in enumerate(boxes):
+            if assigned[i] is not None:
+                continue
+            x, y, w, h = box
+            cx, cy = x + w / 2, y + h / 2
+            max_dist = 0.5 * (w * w + h * h) ** 0.5
+            best, best_dist = None, None
+            for track in live:
+                if track.track_id in used:
+                    continue
+                tx, ty, tw, th = track.box
+                dist = ((tx + tw / 2 - cx) ** 2 + (ty + th / 2 - cy) ** 2) ** 0.5
+                if dist <= max_dist and (best is None or dist < best_dist):
+                    best, best_dist = track, dist
+            if best is None:
+                best = Track(self._next_id, box, timestamp)
+                self.tracks[best.track_id] = best
+                self._next_id += 1
+            assigned[i] = best
+            used.add(best.track_id)
+
+        for track, box in zip(assigned, boxes):
+            track.box = box
+            track.last_seen = timestamp
+        return assigned
+
+    def pop_finished(self, timestamp):
+        """Remove and return tracks that have not been seen for more than max_gap seconds"""
+        finished = [t for t in self.tracks.values() if timestamp - t.last_seen > self.max_gap]
+        for track in finished:
+            del self.tracks[track.track_id]
+        return finished
+
+    def pop_all(self):
+        finished = list(self.tracks.values())
+        self.tracks = {}
+        return finished
@@ -1,21 +1,59 @@
 # CORRECTED vision_engine.py FILE
 
+import hashlib
+import json
 import logging
 import os
+import time
 from collections import Counter
 from datetime import datetime, timezone
 
 import cv2
-import face_recognition
 import numpy as np
-from sklearn.cluster import KMeans
 
 from app import db
-from app.models import Case, Sighting
+from app.models import AISettings, Case, Sighting, VideoCheckpoint
+from app.sighting_events import SightingEventBuilder
 
 # Configure proper logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+FACE_MATCH_TOLERANCE = 0.6  # same default as face_recognition.compare_faces; every backend shares its scale
+FACE_CONFIDENCE_THRESHOLD = 0.75  # minimum 1 - distance for a face sighting, unless set in AISettings
+
+# HOG person detector trade-offs. The detection window is 64x128 pixels, so a
+# downscale of 0.5 misses people shorter than ~256 pixels in the frame.
+HOG_PROFILES = {
+    "fast": {"downscale": 0.5, "win_stride": (8, 8), "padding": (8, 8), "scale": 1.1, "min_weight": 0.3},
+    "balanced": {"downscale": 0.75, "win_stride": (8, 8), "padding": (8, 8), "scale": 1.05, "min_weight": 0.4},
+    "thorough": {"downscale": 1.0, "win_stride": (4, 4), "padding": (8, 8), "scale": 1.05, "min_weight": 0.5},
+}
+
+
+def configured_confidence_threshold():
+    """The admin-configured match threshold (AISettings ``confidence_threshold``), else the default."""
+    setting = AISettings.query.filter_by(setting_name="confidence_threshold").first()
+    try:
+        return float(setting.setting_value) if setting else FACE_CONFIDENCE_THRESHOLD
+    except ValueError:
+        logging.warning(f"Ignoring invalid confidence_threshold setting: {setting.setting_value!r}")
+        return FACE_CONFIDENCE_THRESHOLD
+
+
+def configured_clothing_analysis():
+    """Whether clothing colours are compared (AISettings ``enable_clothing_analysis``), on by default."""
+    setting = AISettings.query.filter_by(setting_name="enable_clothing_analysis").first()
+    return setting is None or setting.setting_value.strip().lower() == "true"
+
+
+def face_distance_matrix(face_encodings, target_encodings, target_sq_norms=None):
+    """Euclidean distances between every detected face and every target, shape (faces, targets)."""
+    faces = np.asarray(face_encodings, dtype=np.float64)
+    if target_sq_norms is None:
+        target_sq_norms = np.einsum("ij,ij->i", target_encodings, target_encodings)
+    sq = np.einsum("ij,ij->i", faces, faces)[:, None] + target_sq_norms[None, :] - 2.0 * (faces @ target_encodings.T)
+    return np.sqrt(np.maximum(sq, 0.0))
+
 
 class VisionProcessor:
     def __init__(self, case_id):
@@ -26,205 +64,855 @@ class VisionProcessor:
             logging.error(f"VisionProcessor failed to initialize: Case {case_id} not found.")
             raise ValueError(f"Case {case_id} not found")
 
+        self.frame_skip = 15  # Frame stride used when a video does not report its fps
+        self.settings = self._load_settings()
+        self.settings["hog_profile"] = self._hog_profile()
+        self._init_detectors()
         self.target_encodings = self._get_target_encodings()
-        self.target_colors = self._get_target_clothing_colors()
-        self.frame_skip = 15  # Process every 15th frame for efficiency
+        self.target_sq_norms = np.einsum("ij,ij->i", self.target_encodings, self.target_encodings)
+        self.target_clothing = self._get_target_clothing()
+        self.settings["clothing_filter"] = self._clothing_filter_signature()
+        self.counters = Counter()
+        self.tracker = None
+        self.events = None
+        self.writer = None
+        self.checkpoint = None
+        self.archive = None
+        self._current_video = None
+        self._prior_sightings = 0
+        logging.info(f"VisionProcessor initialized for case {self.case_id}")
+
+    @classmethod
+    def for_worker(cls, case_id, target_encodings, settings, target_clothing=None):
+        """Create a detector-only processor for a pipeline worker process (no DB or app context)."""
+        from app.clothing import HIST_SIZE
+
+        processor = cls.__new__(cls)
+        processor.case_id = case_id
+        processor.case = None
+        processor.target_encodings = target_encodings
+        processor.target_sq_norms = np.einsum("ij,ij->i", target_encodings, target_encodings)
+        processor.target_clothing = target_clothing if target_clothing is not None else np.empty((0, HIST_SIZE))
+        processor.frame_skip = 15
+        processor.settings = settings
+        processor.counters = Counter()
+        processor.tracker = None
+        processor._init_detectors()
+        return processor
+
+    @staticmethod
+    def _load_settings():
+        """Snapshot the vision settings so worker processes can use them without an app context."""
+        from flask import current_app
 
+        from app.face_backends import face_backend_settings
+
+        config = current_app.config
+        return {
+            "face_backend": face_backend_settings(),
+            "workers": config.get("VISION_WORKERS", 0),
+            "queue_depth": config.get("VISION_QUEUE_DEPTH", 16),
+            "sample_rate": config.get("VISION_SAMPLE_RATE", 2.0),
+            "seek_min_gap": config.get("VISION_SEEK_MIN_GAP", 0),
+            "face_mode": config.get("VISION_FACE_MODE", "roi"),
+            "face_downscale": config.get("VISION_FACE_DOWNSCALE", 0.5),
+            "motion_gate": config.get("VISION_MOTION_GATE", True),
+            "motion_min_area": config.get("VISION_MOTION_MIN_AREA", 0.002),
+            "tracking": config.get("VISION_TRACKING", True),
+            "track_iou": config.get("VISION_TRACK_IOU", 0.3),
+            "track_max_gap": config.get("VISION_TRACK_MAX_GAP", 2.0),
+            "track_quality_gain": config.get("VISION_TRACK_QUALITY_GAIN", 1.2),
+            "event_max_gap": config.get("VISION_EVENT_MAX_GAP", 5.0),
+            "sighting_batch_size": config.get("VISION_SIGHTING_BATCH_SIZE", 50),
+            "sighting_flush_interval": config.get("VISION_SIGHTING_FLUSH_INTERVAL", 10.0),
+            "checkpoint_interval": config.get("VISION_CHECKPOINT_INTERVAL", 60.0),
+            "face_archive": config.get("VISION_FACE_ARCHIVE", True),
+            "archive_folder": config.get("VISION_ARCHIVE_FOLDER", "face_archives"),
+            "index_nprobe": config.get("VISION_INDEX_NPROBE", 8),
+            "confidence_threshold": configured_confidence_threshold(),
+            "clothing_analysis": configured_clothing_analysis(),
+            "clothing_min_score": config.get("VISION_CLOTHING_MIN_SCORE", 0.0),
+            "frame_source": config.get("VISION_FRAME_SOURCE", "opencv"),
+            "decode_max_height": config.get("VISION_DECODE_MAX_HEIGHT", 720),
+            "ffmpeg_binary": config.get("VISION_FFMPEG_BINARY", "ffmpeg"),
+            "two_pass": config.get("VISION_TWO_PASS", False),
+            "coarse_sample_rate": config.get("VISION_COARSE_SAMPLE_RATE", 0.5),
+            "refine_margin": config.get("VISION_REFINE_MARGIN", 2.0),
+            "face_min_size": config.get("VISION_FACE_MIN_SIZE", 40),
+            "face_min_sharpness": config.get("VISION_FACE_MIN_SHARPNESS", 30.0),
+            "face_max_yaw": config.get("VISION_FACE_MAX_YAW", 0.4),
+            "track_encode_window": config.get("VISION_TRACK_ENCODE_WINDOW", 1.0),
+            "hog_profile": config.get("VISION_HOG_PROFILE", "thorough"),
+            "hog_profile_critical": config.get("VISION_HOG_PROFILE_CRITICAL", "fast"),
+        }
+
+    def _hog_profile(self):
+        """The case's person detector profile; Critical cases default to a faster one so first sightings arrive sooner."""
+        if self.case.detection_profile in HOG_PROFILES:
+            return self.case.detection_profile
+        profile = self.settings["hog_profile_critical" if self.case.priority == "Critical" else "hog_profile"]
+        if profile not in HOG_PROFILES:
+            logging.warning(f"Unknown HOG profile {profile!r}; using 'thorough'")
+            return "thorough"
+        return profile
+
+    def _init_detectors(self):
         # FIX: Initialize a proper person detector (HOG detector).
         self.hog = cv2.HOGDescriptor()
         self.hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
-        logging.info(f"VisionProcessor initialized for case {self.case_id}")
+
+        from app.face_backends import create_face_backend
+        self.face_backend = create_face_backend(**self.settings["face_backend"])
 
     def _get_target_encodings(self):
-        """Load all target images and return face encodings."""
+        """Return the face encodings of all target images as one (n, 128) matrix."""
+        from app.face_cache import ENCODING_SIZE, get_target_encodings
+
         encodings = []
         for target_image in self.case.target_images:
             try:
-                # Secure path construction to prevent path traversal
-                from werkzeug.utils import secure_filename
-                from flask import current_app
-                
-                # Validate and secure the image path
-                if not target_image.image_path or '..' in target_image.image_path:
-                    logging.warning(f"Invalid image path for target image {target_image.id}")
-                    continue
-                    
-                # Use secure path construction
-                upload_folder = current_app.config.get('UPLOAD_FOLDER', 'app/static/uploads')
-                filename = os.path.basename(target_image.image_path)
-                secure_name = secure_filename(filename)
-                image_path = os.path.join(upload_folder, secure_name)
-                
-                # Ensure path is within allowed directory
-                if not os.path.abspath(image_path).startswith(os.path.abspath(upload_folder)):
-                    logging.warning(f"Path traversal attempt detected for image {target_image.id}")
-                    continue
-                    
-                image = face_recognition.load_image_file(image_path)
-                face_encodings = face_recognition.face_encodings(image)
-                if face_encodings:
-                    encodings.extend(face_encodings)
+                encodings.append(get_target_encodings(target_image, self.face_backend))
             except Exception:
+                db.session.rollback()
                 logging.error(f"Error processing target image {target_image.id} for case {self.case_id}", exc_info=True)
-        return encodings
-
-    def _get_target_clothing_colors(self):
-        """Get dominant colors from target images."""
-        # This is a placeholder for a more advanced color analysis.
-        # For now, it relies on the user-provided colors.
-        colors = []
-        if self.case.primary_clothing_color:
-            colors.append(self.case.primary_clothing_color)
-        if self.case.secondary_clothing_color:
-            colors.append(self.case.secondary_clothing_color)
-        # In a future version, you could analyze target_images here.
-        return colors
-
-    def _detect_people(self, frame):
-        """Detect people in a frame using HOG detector."""
-        # FIX: Replaced placeholder with a real person detection model.
-        (rects, weights) = self.hog.detectMultiScale(frame, winStride=(4, 4), padding=(8, 8), scale=1.05)
-        # We only care about detections with a reasonable confidence (weight)
-        confident_rects = [r for i, r in enumerate(rects) if weights[i] > 0.5]
-        return confident_rects
-
-    def _process_frame(self, frame, frame_number, fps, video_obj):
-        """Process a single frame for person detection and matching."""
-        timestamp = frame_number / fps
-        people_boxes = self._detect_people(frame)
+        if not encodings:
+            return np.empty((0, ENCODING_SIZE))
+        return np.vstack(encodings)
 
-        for (x, y, w, h) in people_boxes:
+    def _get_target_clothing(self):
+        """Square roots of the torso histograms of the case's front and full-body photos, ready for clothing_scores."""
+        from app.clothing import CLOTHING_IMAGE_TYPES, HIST_SIZE
+        from app.face_cache import get_target_clothing_histograms
+
+        histograms = []
+        if self.settings["clothing_analysis"]:
+            for target_image in self.case.target_images:
+                if target_image.image_type not in CLOTHING_IMAGE_TYPES:
+                    continue
+                try:
+                    histograms.append(get_target_clothing_histograms(target_image, self.face_backend))
+                except Exception:
+                    db.session.rollback()
+                    logging.error(f"Error reading clothing of target image {target_image.id} for case {self.case_id}", exc_info=True)
+        if not histograms:
+            return np.empty((0, HIST_SIZE))
+        return np.sqrt(np.vstack(histograms).astype(np.float64))
+
+    def _clothing_filter_signature(self):
+        """Identify the clothing pre-filter, which decides which faces are encoded (and archived); None when off."""
+        if self.settings["clothing_min_score"] <= 0 or len(self.target_clothing) == 0:
+            return None
+        digest = hashlib.sha256(self.target_clothing.tobytes()).hexdigest()[:16]
+        return f"{self.settings['clothing_min_score']}:{digest}"
+
+    def _clothing_scores(self, frame, boxes):
+        """Clothing similarity of every person box to the targets, or None per box without clothing targets."""
+        from app.clothing import clothing_histogram, clothing_scores, person_torso
+
+        if len(self.target_clothing) == 0 or not boxes:
+            return [None] * len(boxes)
+        histograms = [clothing_histogram(person_torso(frame[y : y + h, x : x + w])) for (x, y, w, h) in boxes]
+        return [
+            float(score) if hist is not None else None
+            for hist, score in zip(histograms, clothing_scores(histograms, self.target_clothing))
+        ]
+
+    def _skip_for_clothing(self, clothing_score, track):
+        """Skip the face pipeline for people dressed nothing like the targets, unless their track already has a face."""
+        min_score = self.settings["clothing_min_score"]
+        if min_score <= 0 or clothing_score is None or clothing_score >= min_score:
+            return False
+        return track is None or track.encoded_quality is None
+
+    def _detect_people(self, frame, regions=None):
+        """Detect people in a frame using HOG detector, optionally only inside motion regions."""
+        if regions is not None:
+            boxes = []
+            for (rx, ry, rw, rh) in regions:
+                for (x, y, w, h) in self._detect_people(frame[ry : ry + rh, rx : rx + rw]):
+                    boxes.append((x + rx, y + ry, w, h))
+            return boxes
+
+        profile = HOG_PROFILES[self.settings["hog_profile"]]
+        scale = profile["downscale"]
+        height, width = frame.shape[:2]
+        if scale < 1 and height * scale >= 128 and width * scale >= 64:
+            image = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        else:
+            # Crops already smaller than the detection window are scanned as they are
+            image, scale = frame, 1.0
+
+        (rects, weights) = self.hog.detectMultiScale(
+            image, winStride=profile["win_stride"], padding=profile["padding"], scale=profile["scale"]
+        )
+        # We only care about detections with a reasonable confidence (weight), mapped back to frame coordinates
+        return [
+            tuple(int(round(v / scale)) for v in rect)
+            for rect, weight in zip(rects, np.ravel(weights))
+            if weight > profile["min_weight"]
+        ]
+
+    def _analyze_frame(self, frame, regions=None, tracker=None, timestamp=None):
+        """Detect people in a frame and score each person's face against the targets; one observation per person box."""
+        people_boxes = self._detect_people(frame, regions)
+        if self.settings["face_mode"] == "frame":
+            return self._analyze_frame_faces(frame, people_boxes, tracker, timestamp)
+
+        deferred = tracker is None and self.settings["tracking"]
+        tracks = tracker.assign(people_boxes, timestamp) if tracker is not None else [None] * len(people_boxes)
+        clothing = self._clothing_scores(frame, people_boxes)
+        observations = []
+        for box, track, clothing_score in zip(people_boxes, tracks, clothing):
+            x, y, w, h = box
             person_roi = frame[y : y + h, x : x + w]
+            if not deferred and self._skip_for_clothing(clothing_score, track):
+                self.counters["faces_skipped_clothing"] += 1
+                observations.append(self._observation(box, 0.0, person_roi, track))
+                continue
+
+            face_confidence, faces, located = self._match_face(person_roi, track)
+            observation = self._observation(box, face_confidence, person_roi, track, faces, keep_roi=deferred and located)
+            if deferred:
+                observation.update(clothing=clothing_score, faces_located=located)
+            observations.append(observation)
+        return observations
+
+    def _observation(self, box, confidence, person_roi, track=None, faces=(), keep_roi=False):
+        """Describe one person box, keeping its crop only for matches or when ``keep_roi`` is set."""
+        keep_roi = keep_roi or confidence > self.settings["confidence_threshold"]
+        return {
+            "box": box,
+            "confidence": confidence,
+            "method": "face",
+            "roi": person_roi.copy() if keep_roi else None,
+            "track_id": track.track_id if track is not None else None,
+            "faces": list(faces),
+        }
+
+    def _apply_tracks(self, observations, tracker, timestamp):
+        """Make the per-track decisions for observations a pipeline worker analyzed without a tracker."""
+        if tracker is None:
+            return observations
+        tracks = tracker.assign([obs["box"] for obs in observations], timestamp)
+        applied = []
+        for obs, track in zip(observations, tracks):
+            obs = dict(obs, track_id=track.track_id)
+            if self._skip_for_clothing(obs.pop("clothing", None), track):
+                self.counters["faces_discarded_clothing"] += len(obs["faces"])
+                obs.update(confidence=0.0, faces=[])
+            elif obs["faces"]:
+                quality = max(score for score, _ in obs["faces"])
+                if self._track_needs_encoding(track, quality):
+                    track.record_encoding(quality, obs["confidence"], obs["faces"], track.last_seen)
+                else:
+                    self.counters["encodings_discarded"] += len(obs["faces"])
+                    obs.update(confidence=track.confidence, faces=track.faces)
+            elif obs.get("faces_located") and track.encoded_quality is not None:
+                # Only unusable faces: a tracked person keeps the identity of their last good face
+                obs.update(confidence=track.confidence, faces=track.faces)
+            obs.pop("faces_located", None)
+            if obs["confidence"] <= self.settings["confidence_threshold"]:
+                obs["roi"] = None
+            applied.append(obs)
+        return applied
+
+    def _analyze_frame_faces(self, frame, people_boxes, tracker=None, timestamp=None):
+        """Frame-level face mode: locate faces once per frame and assign them to person boxes."""
+        if len(self.target_encodings) == 0:
+            return []
+        try:
+            faces_by_box = {}
+            for location, score in self._usable_faces(frame, self.face_backend.locate(frame, self.settings["face_downscale"])):
+                box = self._person_box_for_face(location, people_boxes, frame.shape)
+                faces_by_box.setdefault(box, []).append((location, score))
+
+            boxes = list(people_boxes) + [box for box in faces_by_box if box not in people_boxes]
+            deferred = tracker is None and self.settings["tracking"]
+            tracks = tracker.assign(boxes, timestamp) if tracker is not None else [None] * len(boxes)
+            track_by_box = dict(zip(boxes, tracks))
+
+            # Decide per box whether its faces need encoding, then encode them all in one call
+            clothing = dict(zip(faces_by_box, self._clothing_scores(frame, list(faces_by_box))))
+            confidences = {}
+            box_faces = {}
+            to_encode = []
+            for box, faces in faces_by_box.items():
+                track = track_by_box[box]
+                if not deferred and self._skip_for_clothing(clothing[box], track):
+                    self.counters["faces_skipped_clothing"] += len(faces)
+                    continue
+                quality = max(score for _, score in faces)
+                if track is not None and not self._track_needs_encoding(track, quality):
+                    self.counters["encodings_skipped"] += len(faces)
+                    confidences[box] = track.confidence
+                    box_faces[box] = track.faces
+                    continue
+                to_encode.extend((box, location, score) for location, score in faces)
+
+            if to_encode:
+                encodings = self.face_backend.encode(frame, [location for _, location, _ in to_encode])
+                self.counters["encodings_computed"] += len(encodings)
+                for (box, _, score), encoding, (_, confidence) in zip(to_encode, encodings, self._match_faces(encodings)):
+                    confidences[box] = max(confidence, confidences.get(box, 0.0))
+                    box_faces.setdefault(box, []).append((score, encoding))
+                for box in {box for box, _, _ in to_encode}:
+                    track = track_by_box[box]
+                    if track is not None:
+                        quality = max(score for _, score in faces_by_box[box])
+                        track.record_encoding(quality, confidences[box], box_faces[box], track.last_seen)
+        except Exception:
+            logging.error(f"Error during frame-level face matching for case {self.case_id}", exc_info=True)
+            return []
+
+        observations = []
+        for box in boxes:
+            x, y, w, h = box
+            confidence = confidences.get(box, 0.0)
+            observation = self._observation(
+                box, confidence, frame[y : y + h, x : x + w], track_by_box[box], box_faces.get(box, ()),
+                keep_roi=deferred and box in box_faces,
+            )
+            if deferred:
+                observation["clothing"] = clothing.get(box)
+            observations.append(observation)
+        return observations
+
+    @staticmethod
+    def _person_box_for_face(location, people_boxes, frame_shape):
+        """Return the smallest person box whose upper half contains the face centre, or one built around the face."""
+        top, right, bottom, left = location
+        cx, cy = (left + right) / 2, (top + bottom) / 2
+
+        best = None
+        for (x, y, w, h) in people_boxes:
+            if x <= cx <= x + w and y <= cy <= y + h / 2:
+                if best is None or w * h < best[2] * best[3]:
+                    best = (x, y, w, h)
+        if best is not None:
+            return best
+
+        # HOG missed the body: approximate it as 3 face widths by 7 face heights
+        face_w, face_h = right - left, bottom - top
+        frame_h, frame_w = frame_shape[:2]
+        x = max(0, int(cx - 1.5 * face_w))
+        y = max(0, int(top - 0.5 * face_h))
+        return (x, y, min(frame_w, int(cx + 1.5 * face_w)) - x, min(frame_h, int(top + 6.5 * face_h)) - y)
+
+    def _record_observations(self, observations, frame_number, fps, video_obj):
+        """Feed the observations of one frame into sighting events, per track when tracking."""
+        timestamp = frame_number / fps
+        if self.tracker is None:
+            for obs in observations:
+                if self.archive is not None:
+                    self.archive.add(timestamp, -1, obs["box"], obs["faces"])
+                if obs["confidence"] > self.settings["confidence_threshold"]:
+                    self.events.add([(timestamp, obs["confidence"])], obs["confidence"], timestamp, obs["box"], obs["roi"])
+            horizon = timestamp
+        else:
+            if any(obs["track_id"] is None for obs in observations):
+                tracks = self.tracker.assign([obs["box"] for obs in observations], timestamp)
+            else:
+                tracks = [self.tracker.get(obs["track_id"]) for obs in observations]
+            for obs, track in zip(observations, tracks):
+                if self.archive is not None:
+                    self.archive.add(timestamp, track.track_id, obs["box"], obs["faces"])
+                track.observe(timestamp, obs["confidence"], obs["box"], obs["roi"])
+
+            for track in self.tracker.pop_finished(timestamp):
+                self._finish_track(track)
+            # A live track may still add matches going back to its first one
+            horizon = min([timestamp] + [t.matches[0][0] for t in self.tracker.tracks.values() if t.matches])
+
+        for event in self.events.pop_closed(horizon):
+            self._create_sighting(event, video_obj)
+
+        # Everything before the oldest open match is either saved or pending in the writer
+        resume_time = min([horizon] + [e.start for e in self.events.events])
+        self._resume_frame = int(resume_time * fps)
+        self._last_frame = frame_number
+        self.writer.flush_if_due()
+        self._checkpoint_if_due()
+
+    def _checkpoint_if_due(self):
+        """Periodically save pending sightings together with the frame a retry can resume from."""
+        if self.checkpoint is None:
+            return
+        if time.monotonic() - self._last_checkpoint < self.settings["checkpoint_interval"]:
+            return
+        self.writer.flush()
+        self._stage_checkpoint()
+        db.session.commit()
+        self._last_checkpoint = time.monotonic()
+
+    def _stage_checkpoint(self):
+        """Update the checkpoint row in the current transaction (called with every sighting batch)."""
+        if self.checkpoint is None or self._last_frame is None:
+            return
+        self.checkpoint.next_frame = self._resume_frame
+        self.checkpoint.last_frame = self._last_frame
+        self.checkpoint.state = json.dumps({"sightings": self._prior_sightings + self.writer.written})
+
+    def _finish_track(self, track):
+        """Add a finished track that matched a target to the sighting events."""
+        if track.best_confidence > self.settings["confidence_threshold"] and track.best_roi is not None:
+            self.events.add(track.matches, track.best_confidence, track.best_timestamp, track.best_box, track.best_roi)
+
+    def _process_frame(self, frame, frame_number, fps, video_obj, regions=None):
+        """Process a single frame for person detection and matching."""
+        observations = self._analyze_frame(frame, regions, self.tracker, frame_number / fps)
+        self._record_observations(observations, frame_number, fps, video_obj)
+
+    def _match_faces(self, face_encodings):
+        """Match all faces of a frame or ROI against the targets; one (target_index, confidence) pair per face."""
+        if len(face_encodings) == 0 or len(self.target_encodings) == 0:
+            return [(None, 0.0)] * len(face_encodings)
+
+        distances = face_distance_matrix(face_encodings, self.target_encodings, self.target_sq_norms)
+        best_targets = distances.argmin(axis=1)
+        best_distances = distances[np.arange(len(best_targets)), best_targets]
+        return [
+            (int(target), 1.0 - float(distance)) if distance <= FACE_MATCH_TOLERANCE else (None, 0.0)
+            for target, distance in zip(best_targets, best_distances)
+        ]
 
-            # Try face matching first
-            face_confidence = self._match_face(person_roi)
-            if face_confidence > 0.75:  # High confidence threshold for faces
-                self._create_sighting(timestamp, face_confidence, "face", video_obj, person_roi)
-                continue  # If we get a strong face match, we can be confident.
-
-            # If no strong face match, try clothing matching
-            # This logic can be expanded in the future
-            # clothing_confidence = self._match_clothing(person_roi)
-            # if clothing_confidence > 0.6:
-            #     self._create_sighting(timestamp, clothing_confidence, "clothing", video_obj, person_roi)
-
-    def _match_face(self, person_roi):
-        """Match face in a person's region of interest (ROI)."""
-        if not self.target_encodings:
-            return 0.0
+    def _score_encodings(self, face_encodings):
+        """Confidence of the best target match for each face encoding, as an array."""
+        return np.array([confidence for _, confidence in self._match_faces(face_encodings)])
+
+    def search_archives(self, video_ids=None):
+        """Find this case's targets in the face archives of every case; returns (video_id, timestamp, box, confidence) hits."""
+        from app.face_archive import search_face_archives
+
+        threshold = self.settings["confidence_threshold"]
+        hits = []
+        for video_id, archive, confidences in search_face_archives(
+            self.settings["archive_folder"], self.target_encodings, self._score_encodings, video_ids, threshold
+        ):
+            for i in np.flatnonzero(confidences > threshold):
+                box = tuple(int(v) for v in archive["box"][i])
+                hits.append((video_id, float(archive["timestamp"][i]), box, float(confidences[i])))
+        return hits
+
+    def search_index(self, k=10):
+        """Look this case's targets up in the cross-case face index; returns search_archives-style hits, best first."""
+        from app.face_archive import face_archive_path, load_face_archive
+        from app.face_index import get_face_index
+
+        max_distance = 1.0 - self.settings["confidence_threshold"]
+        results = get_face_index().query(
+            self.target_encodings, k=k, nprobe=self.settings["index_nprobe"], max_distance=max_distance
+        )
+        archives = {}
+        hits = {}
+        for video_id, row, distance in (hit for per_target in results for hit in per_target):
+            if video_id not in archives:
+                archives[video_id] = load_face_archive(face_archive_path(self.settings["archive_folder"], video_id))
+            archive = archives[video_id]
+            if archive is None or row >= len(archive):
+                continue
+            face = archive.faces[row]
+            hit = (video_id, float(face["timestamp"]), tuple(int(v) for v in face["box"]), 1.0 - distance)
+            if hits.get((video_id, row), (0, 0, 0, 0.0))[3] < hit[3]:
+                hits[(video_id, row)] = hit
+        return sorted(hits.values(), key=lambda hit: -hit[3])
+
+    def _usable_faces(self, image, locations):
+        """Quality-gate located faces before encoding; returns (location, score) for the usable ones."""
+        from app.face_quality import assess_face
+
+        min_size = self.settings["face_min_size"]
+        max_yaw = self.settings["face_max_yaw"]
+        sized = []
+        for location in locations:
+            top, right, bottom, left = location
+            if min_size and min(right - left, bottom - top) < min_size:
+                self.counters["faces_rejected_small"] += 1
+            else:
+                sized.append(location)
+        landmarks = self.face_backend.landmarks(image, sized) if max_yaw and sized else [None] * len(sized)
+
+        usable = []
+        for location, points in zip(sized, landmarks):
+            score, reason = assess_face(image, location, points, min_size, self.settings["face_min_sharpness"], max_yaw)
+            if reason is None:
+                usable.append((location, score))
+            else:
+                self.counters[f"faces_rejected_{reason}"] += 1
+        return usable
+
+    def _track_needs_encoding(self, track, quality):
+        return track.needs_encoding(
+            quality, self.settings["track_quality_gain"], track.last_seen, self.settings["track_encode_window"]
+        )
+
+    def _match_face(self, person_roi, track=None):
+        """Match faces in a person's ROI; returns (confidence, faces, located)."""
+        if len(self.target_encodings) == 0:
+            return 0.0, [], False
         try:
-            rgb_roi = cv2.cvtColor(person_roi, cv2.COLOR_BGR2RGB)
-            face_locations = face_recognition.face_locations(rgb_roi)
+            face_locations = self.face_backend.locate(person_roi)
             if not face_locations:
-                return 0.0
+                return 0.0, [], False
+
+            usable = self._usable_faces(person_roi, face_locations)
+            if not usable:
+                # A tracked person keeps the identity of their last good face
+                if track is not None and track.encoded_quality is not None:
+                    return track.confidence, track.faces, True
+                return 0.0, [], True
+            face_locations = [location for location, _ in usable]
+
+            # A tracked person is only re-encoded when their face got noticeably better
+            quality = max(score for _, score in usable)
+            if track is not None and not self._track_needs_encoding(track, quality):
+                self.counters["encodings_skipped"] += len(face_locations)
+                return track.confidence, track.faces, True
 
-            roi_face_encodings = face_recognition.face_encodings(rgb_roi, face_locations)
+            roi_face_encodings = self.face_backend.encode(person_roi, face_locations)
+            self.counters["encodings_computed"] += len(roi_face_encodings)
             if not roi_face_encodings:
-                return 0.0
-
-            # Compare the first found face against all target encodings
-            matches = face_recognition.compare_faces(self.target_encodings, roi_face_encodings[0], tolerance=0.6)
-            if any(matches):
-                face_distances = face_recognition.face_distance(self.target_encodings, roi_face_encodings[0])
-                # Confidence is inverse of distance
-                confidence = 1.0 - min(face_distances)
-                return confidence
+                return 0.0, [], True
+
+            # Every face in the ROI is scored; the strongest match wins
+            confidence = max(confidence for _, confidence in self._match_faces(roi_face_encodings))
+            faces = [(score, encoding) for (_, score), encoding in zip(usable, roi_face_encodings)]
+            if track is not None:
+                track.record_encoding(quality, confidence, faces, track.last_seen)
+            return confidence, faces, True
         except Exception:
             # FIX: Replaced print() with proper logging.
             logging.error(f"Error during face matching for case {self.case_id}", exc_info=True)
-        return 0.0
+        return 0.0, [], False
+
+    def _create_sighting(self, event, video_obj):
+        """Queue a sighting record for an event; its best frame becomes the thumbnail."""
+        from app.utils import create_safe_filename
+
+        if any(start <= event.end and event.start <= end for start, end in self._verified_spans):
+            logging.info(f"Skipping sighting at {event.start:.2f}s for case {self.case_id}: already verified")
+            return
+
+        # Create a secure, unique filename for the thumbnail
+        secure_name = create_safe_filename(f"sighting_{self.case_id}_{video_obj.id}", "jpg")
+        # Path to store in the database (relative path)
+        db_path = os.path.join('static', 'uploads', secure_name).replace('\\', '/')
 
-    def _create_sighting(self, timestamp, confidence, method, video_obj, person_roi):
-        """Create a sighting record and save a thumbnail image."""
+        row = {
+            "case_id": self.case_id,
+            "search_video_id": video_obj.id,
+            "video_name": video_obj.video_name,
+            "timestamp": event.start,
+            "end_timestamp": event.end,
+            "confidence_score": event.peak_confidence,
+            "face_score": event.peak_confidence if event.method == "face" else None,
+            "clothing_score": self._sighting_clothing_score(event.best_roi),
+            "detection_method": event.method,
+            "thumbnail_path": db_path,
+            "bounding_box": json.dumps(list(event.best_box)),
+            "frame_scores": event.frame_scores,
+        }
+        self.writer.add(row, event.best_roi, secure_name)
+        logging.info(
+            f"Sighting queued for case {self.case_id} from {event.start:.2f}s to {event.end:.2f}s "
+            f"({len(event.matches)} matches)"
+        )
+
+    def _sighting_clothing_score(self, roi):
+        """Clothing similarity of a sighting's best person crop to the targets, None without clothing targets"""
+        from app.clothing import clothing_histogram, clothing_scores, person_torso
+
+        if roi is None or len(self.target_clothing) == 0:
+            return None
+        histogram = clothing_histogram(person_torso(roi))
+        if histogram is None:
+            return None
+        return float(clothing_scores([histogram], self.target_clothing)[0])
+
+    def _start_video(self):
+        """Reset the per-video collector state: tracker, open events, sighting writer and counters."""
+        from flask import current_app
+        from app.sighting_writer import SightingWriter
+
+        self.tracker = self._create_tracker()
+        self.events = SightingEventBuilder(max_gap=self.settings["event_max_gap"])
+        self.writer = SightingWriter(
+            current_app.config.get('UPLOAD_FOLDER', 'app/static/uploads'),
+            batch_size=self.settings["sighting_batch_size"],
+            flush_interval=self.settings["sighting_flush_interval"],
+            before_commit=self._stage_checkpoint,
+        )
+        self.counters = Counter()
+        self._resume_frame = None
+        self._last_frame = None
+        self._last_checkpoint = time.monotonic()
+
+        # Sightings a reviewer verified survive reprocessing; events overlapping them are not written again
+        self._verified_spans = [
+            (start, end if end is not None else start)
+            for start, end in Sighting.query.filter_by(
+                case_id=self.case_id, search_video_id=self._current_video.id, verified=True
+            ).with_entities(Sighting.timestamp, Sighting.end_timestamp)
+        ]
+
+    def _finish_video(self):
+        """Write everything still open for the current video and return its collector stats."""
+        stats = {}
+        if self.tracker is not None:
+            for track in self.tracker.pop_all():
+                self._finish_track(track)
+            stats["tracks"] = self.tracker.tracks_started
+        for event in self.events.pop_all():
+            self._create_sighting(event, self._current_video)
+        if self._last_frame is not None:
+            # Nothing is left open: a crash after this flush must not redo the video
+            self._resume_frame = self._last_frame + 1
+        self.writer.flush()
+        stats["sightings"] = self._prior_sightings + self.writer.written
+        stats.update(self.counters)
+        stats["encodings_avoided"] = sum(
+            count
+            for key, count in self.counters.items()
+            if key in ("encodings_skipped", "faces_skipped_clothing") or key.startswith("faces_rejected_")
+        )
+        return stats
+
+    def _close_writer(self, video):
+        """Save the sightings still pending for a video, also after a failure part way; errors are logged."""
+        if self.writer is None:
+            return
         try:
-            from werkzeug.utils import secure_filename
-            from flask import current_app
-            
-            # Create a secure filename for the thumbnail
-            timestamp_str = f"{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S_%f')}"
-            thumbnail_filename = f"sighting_{self.case_id}_{video_obj.id}_{timestamp_str}.jpg"
-            secure_name = secure_filename(thumbnail_filename)
-            
-            # Use secure path construction
-            upload_folder = current_app.config.get('UPLOAD_FOLDER', 'app/static/uploads')
-            thumbnail_save_path = os.path.join(upload_folder, secure_name)
-            
-            # Ensure path is within allowed directory
-            if not os.path.abspath(thumbnail_save_path).startswith(os.path.abspath(upload_folder)):
-                logging.error(f"Invalid thumbnail path for case {self.case_id}")
-                return
-            
-            # Verify write operation success
-            success = cv2.imwrite(thumbnail_save_path, person_roi)
-            if not success:
-                logging.error(f"Failed to save thumbnail for case {self.case_id}")
-                return
-            
-            # Path to store in the database (relative path)
-            db_path = os.path.join('static', 'uploads', secure_name).replace('\\', '/')
-
-            sighting = Sighting(
-                case_id=self.case_id,
-                search_video_id=video_obj.id,
-                timestamp=timestamp,
-                confidence_score=confidence,
-                detection_method=method,
-                thumbnail_path=db_path
-            )
-            db.session.add(sighting)
-            db.session.commit()
-            logging.info(f"Sighting created for case {self.case_id} at timestamp {timestamp:.2f}s")
+            self.writer.close()
         except Exception:
             db.session.rollback()
-            logging.error(f"Failed to create sighting for case {self.case_id}", exc_info=True)
+            logging.error(f"Failed to save pending sightings for video {video.id} of case {self.case_id}", exc_info=True)
+        self.writer = None
 
-    def run_analysis(self):
-        """Main method to analyze all search videos for the case."""
-        logging.info(f"Starting analysis for case {self.case_id}")
-        search_videos = self.case.search_videos
+    def _create_sampler(self, cap, start_time=0.0, end_time=None, path=None, sample_rate=None):
+        """Build the frame source: an ffmpeg pipe when configured and usable, else a FrameSampler over ``cap``."""
+        from app.frame_sources import FFmpegFrameSource, FrameSampler, ffmpeg_available
+
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        sample_rate = self.settings["sample_rate"] if sample_rate is None else sample_rate
+        if self.settings["frame_source"] == "ffmpeg" and path is not None:
+            if fps > 0 and sample_rate > 0 and ffmpeg_available(self.settings["ffmpeg_binary"]):
+                return FFmpegFrameSource(
+                    path,
+                    fps,
+                    int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                    int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                    sample_rate=sample_rate,
+                    start_time=start_time,
+                    end_time=end_time,
+                    max_height=self.settings["decode_max_height"],
+                    binary=self.settings["ffmpeg_binary"],
+                )
+            logging.warning(f"ffmpeg frame source unavailable for {path}; decoding with OpenCV")
+
+        return FrameSampler(
+            cap,
+            sample_rate=sample_rate,
+            seek_min_gap=self.settings["seek_min_gap"],
+            fallback_step=self.frame_skip,
+            start_time=start_time,
+            end_time=end_time,
+        )
 
-        for video in search_videos:
-            video_path = os.path.join('app', video.video_path)
-            if not os.path.exists(video_path):
-                logging.error(f"Video file not found: {video_path} for case {self.case_id}")
+    def _gate_frames(self, frames, stats):
+        """Drop sampled frames without motion; yield (frame_number, frame, regions) for the rest."""
+        from app.motion import MotionGate
+
+        gate = MotionGate(min_area_ratio=self.settings["motion_min_area"]) if self.settings["motion_gate"] else None
+        for frame_number, frame in frames:
+            stats["frames_sampled"] += 1
+            regions = gate.regions(frame) if gate is not None else None
+            if regions == []:
+                stats["frames_gated"] += 1
                 continue
+            yield frame_number, frame, regions
 
-            cap = None  # Initialize cap to None
-            try:
-                video.status = "Processing"
-                db.session.commit()
-
-                cap = cv2.VideoCapture(video_path)
-                if not cap.isOpened():
-                    logging.error(f"Could not open video file: {video_path}")
-                    video.status = "Failed"
-                    db.session.commit()
-                    continue
-                
-                fps = cap.get(cv2.CAP_PROP_FPS)
-                frame_count = 0
+    def _sample_windows(self, cap, path, windows, stats):
+        """Sample and motion-gate each ``(start, end)`` time window in turn, adding the decode counters to ``stats``."""
+        for start_time, end_time in windows:
+            sampler = self._create_sampler(cap, start_time, end_time, path)
+            yield from self._gate_frames(sampler, stats)
+            for key in ("frames_decoded", "frames_grabbed", "seeks"):
+                stats[key] = stats.get(key, 0) + getattr(sampler, key)
+
+    def _coarse_pass(self, cap, path, start_time, end_time, stats):
+        """First pass of two-pass mode: return the time windows around frames showing a person."""
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        rate = self.settings["coarse_sample_rate"]
+        reach = 1.0 / rate + self.settings["refine_margin"]
+        duration = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0) / fps
+        scan_end = duration if end_time is None else min(end_time, duration)
 
-                while True:
-                    ret, frame = cap.read()
-                    if not ret:
-                        break
+        coarse = Counter()
+        sampler = self._create_sampler(cap, start_time, end_time, path, sample_rate=rate)
+        windows = []
+        for frame_number, frame, regions in self._gate_frames(sampler, coarse):
+            if not (self._detect_people(frame, regions) or self.face_backend.locate(frame, self.settings["face_downscale"])):
+                continue
+            timestamp = frame_number / fps
+            window = (max(start_time, timestamp - reach), min(scan_end, timestamp + reach))
+            if windows and window[0] <= windows[-1][1]:
+                windows[-1] = (windows[-1][0], window[1])
+            else:
+                windows.append(window)
+        if windows and end_time is None and windows[-1][1] >= scan_end:
+            # Container durations are approximate; let the last window run to the real end
+            windows[-1] = (windows[-1][0], None)
 
-                    if frame_count % self.frame_skip == 0:
-                        self._process_frame(frame, frame_count, fps, video)
-                    frame_count += 1
+        stats.update(
+            coarse_seconds=max(0.0, scan_end - start_time),
+            coarse_frames=coarse["frames_sampled"],
+            coarse_frames_decoded=sampler.frames_decoded,
+            fine_windows=len(windows),
+            fine_seconds=sum((scan_end if end is None else end) - start for start, end in windows),
+        )
+        logging.info(f"Coarse pass of {path} flagged {len(windows)} windows ({stats['fine_seconds']:.0f}s of {stats['coarse_seconds']:.0f}s)")
+        return windows
 
-                video.status = "Completed"
-                # FIX: Use timezone-aware datetime object.
-                video.processed_at = datetime.now(timezone.utc)
-                db.session.commit()
-                logging.info(f"Finished processing video {video.id} for case {self.case_id}")
+    def _create_tracker(self):
+        """Return a fresh per-video person tracker, or None when tracking is disabled."""
+        from app.tracking import PersonTracker
 
-            except Exception:
-                logging.error(f"A critical error occurred while processing video {video.id}", exc_info=True)
-                video.status = "Failed"
-                db.session.commit()
-            
-            finally:
-                # FIX: Ensure video capture is always released to prevent memory leaks.
-                if cap is not None:
-                    cap.release()
\ No newline at end of file
+        if not self.settings["tracking"]:
+            return None
+        return PersonTracker(iou_threshold=self.settings["track_iou"], max_gap=self.settings["track_max_gap"])
+
+    def _create_pipeline(self):
+        """Start a worker pool for frame analysis, or return None to analyze in-process."""
+        from app.vision_pipeline import FramePipeline
+
+        if self.settings["workers"] <= 1:
+            return None
+        return FramePipeline(self.case_id, self.target_encodings, self.settings, self.target_clothing)
+
+    @property
+    def has_targets(self):
+        return len(self.target_encodings) > 0
+
+    def run_analysis(self, videos=None):
+        """Main method to analyze the given search videos (all of the case's by default) in this process."""
+        logging.info(f"Starting analysis for case {self.case_id}")
+        search_videos = self.case.search_videos if videos is None else videos
+
+        if not self.has_targets:
+            logging.warning(f"No usable target faces for case {self.case_id}; skipping video analysis")
+            return
+
+        pipeline = self._create_pipeline()
+        try:
+            for video in search_videos:
+                self._analyze_video(video, pipeline)
+        finally:
+            if pipeline is not None:
+                pipeline.close()
+
+    def run_video(self, video):
+        """Analyze a single search video and return its final status."""
+        self.run_analysis([video])
+        return video.status
+
+    def run_segment(self, video, start_time, end_time):
+        """Analyze one time range of a chunked video and return its stats; the video status is left to the caller."""
+        pipeline = self._create_pipeline()
+        try:
+            return self._scan_video(video, pipeline, start_time, end_time)
+        finally:
+            if pipeline is not None:
+                pipeline.close()
+
+    def _analyze_video(self, video, pipeline=None):
+        """Analyze one whole search video and record its status and stats."""
+        try:
+            video.status = "Processing"
+            db.session.commit()
+
+            stats = self._scan_video(video, pipeline)
+            video.analysis_stats = json.dumps(stats)
+            video.checkpoints = []
+            video.status = "Completed"
+            # FIX: Use timezone-aware datetime object.
+            video.processed_at = datetime.now(timezone.utc)
+            db.session.commit()
+            logging.info(f"Finished processing video {video.id} for case {self.case_id}")
+
+        except Exception:
+            logging.error(f"A critical error occurred while processing video {video.id}", exc_info=True)
+            db.session.rollback()
+            video.status = "Failed"
+            db.session.commit()
+
+    def _scan_video(self, video, pipeline=None, start_time=0.0, end_time=None):
+        """Decode and analyze a video, or [start_time, end_time) of it; returns the scan stats."""
+        video_path = os.path.join('app', video.video_path)
+        if not os.path.exists(video_path):
+            raise FileNotFoundError(f"Video file not found: {video_path} for case {self.case_id}")
+
+        cap = cv2.VideoCapture(video_path)
+        try:
+            if not cap.isOpened():
+                raise IOError(f"Could not open video file: {video_path}")
+
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            stats = {"frames_sampled": 0, "frames_gated": 0}
+            segment_start = start_time if start_time or end_time is not None else None
+            self.checkpoint = self._load_checkpoint(video, start_time)
+            self._prior_sightings = 0
+            if self.checkpoint is not None and self.checkpoint.next_frame and fps > 0:
+                start_time = max(start_time, self.checkpoint.next_frame / fps)
+                self._prior_sightings = json.loads(self.checkpoint.state or "{}").get("sightings", 0)
+                stats["resumed_from"] = start_time
+                logging.info(f"Resuming video {video.id} for case {self.case_id} from {start_time:.1f}s")
+            elif self.settings["face_archive"]:
+                # A resumed scan never saw the frames before its checkpoint, so only full scans are archived
+                from app.face_archive import FaceArchiveWriter, face_archive_path
+                self.archive = FaceArchiveWriter(
+                    face_archive_path(self.settings["archive_folder"], video.id, segment_start)
+                )
+
+            windows = [(start_time, end_time)]
+            # Two-pass mode needs fps and frame count metadata to place its windows
+            if self.settings["two_pass"] and fps > 0 and cap.get(cv2.CAP_PROP_FRAME_COUNT) > 0 and self.settings["coarse_sample_rate"] > 0:
+                windows = self._coarse_pass(cap, video_path, start_time, end_time, stats)
+            frames = self._sample_windows(cap, video_path, windows, stats)
+            self._current_video = video
+            self._start_video()
+
+            if pipeline is not None:
+                def collect(frame_number, observations, counters):
+                    self.counters.update(counters)
+                    observations = self._apply_tracks(observations, self.tracker, frame_number / fps)
+                    self._record_observations(observations, frame_number, fps, video)
+
+                pipeline.run(frames, collect)
+            else:
+                for frame_number, frame, regions in frames:
+                    self._process_frame(frame, frame_number, fps, video, regions)
+
+            stats.update(self._finish_video())
+            if self.archive is not None:
+                self.archive.close()
+                stats["faces_archived"] = len(self.archive)
+            logging.info(f"Video {video.id} analysis stats ({start_time:.0f}s-{end_time or 'end'}): {stats}")
+            return stats
+
+        finally:
+            # FIX: Ensure video capture is always released to prevent memory leaks.
+            cap.release()
+            self._close_writer(video)
+            self.checkpoint = None
+            if self.archive is not None:
+                self.archive.discard()
+            self.archive = None
+
+    def _load_checkpoint(self, video, segment_start):
+        """Fetch (or start) the resume checkpoint of a video segment; None when checkpoints are off."""
+        if self.settings["checkpoint_interval"] <= 0:
+            return None
+        checkpoint = VideoCheckpoint.query.filter_by(search_video_id=video.id, segment_start=segment_start).first()
+        if checkpoint is None:
+            checkpoint = VideoCheckpoint(search_video_id=video.id, segment_start=segment_start)
+            db.session.add(checkpoint)
+        return checkpoint
@@ -0,0 +1,181 @@
+"""
+Multi-process frame analysis pipeline for VisionProcessor
+"""
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Per-process analyzer, created once by the pool initializer
+_worker_processor = None
+# Shared memory ring the worker is attached to, as (name, SharedMemory)
+_worker_ring = (None, None)
+
+
+def _init_worker(case_id, target_encodings, settings, target_clothing=None):
+    """Build a detector-only VisionProcessor inside each worker process"""
+    global _worker_processor
+    from app.vision_engine import VisionProcessor
+
+    _worker_processor = VisionProcessor.for_worker(case_id, target_encodings, settings, target_clothing)
+
+
+def _attach_ring(name):
+    """Open the decoder's ring in this worker, once per ring"""
+    global _worker_ring
+    if _worker_ring[0] != name:
+        previous = _worker_ring[1]
+        try:
+            # The decoder owns the block; this process must not unlink it at exit (Python 3.13+)
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Older Pythons register it with the resource tracker the forked workers share with the decoder
+            shm = shared_memory.SharedMemory(name=name)
+        _worker_ring = (name, shm)
+        if previous is not None:
+            try:
+                previous.close()
+            except BufferError:
+                pass  # a view of the old ring is still referenced; it is released with it
+    return _worker_ring[1]
+
+
+def _analyze_frame(frame_number, frame, regions):
+    """Run person detection and face matching for one sampled frame"""
+    _worker_processor.counters.clear()
+    observations = _worker_processor._analyze_frame(frame, regions)
+    return frame_number, observations, dict(_worker_processor.counters)
+
+
+def _analyze_ring_frame(frame_number, ring_name, slot, slot_bytes, shape, dtype, regions):
+    """Analyze a frame in place in its ring slot; nothing may keep a reference to it after returning"""
+    shm = _attach_ring(ring_name)
+    frame = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=slot * slot_bytes)
+    return _analyze_frame(frame_number, frame, regions)
+
+
+class FrameRing:
+    """
+    Fixed-size frame slots in one shared memory block.
+
+    The decoder copies a frame into a free slot and hands workers only the
+    slot index; workers map the slot as a NumPy array without copying. A
+    slot is released when the worker's result for it has been collected, so
+    a slot is never rewritten while a worker may still read it.
+    """
+
+    def __init__(self, slots, slot_bytes):
+        self.slot_bytes = slot_bytes
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        self.free = deque(range(slots))
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def put(self, frame):
+        """Copy a frame into a free slot; returns the slot, or None when none is free or the frame does not fit"""
+        if not self.free or frame.nbytes > self.slot_bytes:
+            return None
+        slot = self.free.popleft()
+        np.ndarray(frame.shape, dtype=frame.dtype, buffer=self.shm.buf, offset=slot * self.slot_bytes)[...] = frame
+        return slot
+
+    def release(self, slot):
+        self.free.append(slot)
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+class FramePipeline:
+    """
+    Decoder -> worker pool -> collector pipeline.
+
+    The calling process decodes and submits sampled frames, at most
+    ``queue_depth`` of which are in flight at once. Frames travel through a
+    shared memory FrameRing with one slot per in-flight frame, so only slot
+    indices are pickled. Results are handed to the collector strictly in
+    submission (timestamp) order, so the output is identical to analyzing
+    the frames one after another.
+    """
+
+    def __init__(self, case_id, target_encodings, settings, target_clothing=None):
+        self.case_id = case_id
+        self.workers = settings["workers"]
+        self.queue_depth = max(1, settings["queue_depth"])
+        self._initargs = (case_id, target_encodings, settings, target_clothing)
+        self.executor = self._start()
+        logging.info(f"Started frame pipeline with {self.workers} workers for case {case_id}")
+
+    def _start(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=self._initargs)
+
+    def run(self, frames, on_result):
+        """
+        Analyze ``(frame_number, frame, regions)`` items, calling
+        ``on_result(frame_number, observations, counters)`` in order.
+
+        Workers have no tracker, so every face they find is encoded. The
+        collector associates observations with tracks and applies the
+        per-track decisions (VisionProcessor._apply_tracks) before
+        aggregating them, which keeps the output identical to a serial run;
+        only the encoding savings of tracking are lost. If a worker
+        process dies the pool is restarted and RuntimeError is raised, so
+        the scan fails cleanly and resumes from its checkpoint on retry.
+        """
+        pending = deque()
+        ring = None
+        try:
+            for frame_number, frame, regions in frames:
+                # Backpressure: wait for the oldest frame (and free its slot) before decoding further
+                if len(pending) >= self.queue_depth:
+                    self._collect(pending.popleft(), ring, on_result)
+                if ring is None:
+                    ring = FrameRing(self.queue_depth, frame.nbytes)
+
+                # The frame source may reuse its buffer, so the frame is copied before the next one is read
+                slot = ring.put(frame)
+                if slot is None:
+                    # Larger than the slots (resolution change mid-stream): send a private copy
+                    future = self.executor.submit(_analyze_frame, frame_number, frame.copy(), regions)
+                else:
+                    future = self.executor.submit(
+                        _analyze_ring_frame, frame_number, ring.name, slot, ring.slot_bytes, frame.shape, frame.dtype.str, regions
+                    )
+                pending.append((future, slot))
+
+            while pending:
+                self._collect(pending.popleft(), ring, on_result)
+        finally:
+            for future, _ in pending:
+                future.cancel()
+            if ring is not None:
+                ring.close()
+
+    def _collect(self, item, ring, on_result):
+        future, slot = item
+        try:
+            result = future.result()
+        except BrokenProcessPool as e:
+            logging.error(f"A frame analysis worker died for case {self.case_id}; restarting the pool")
+            self.executor.shutdown(wait=False)
+            self.executor = self._start()
+            raise RuntimeError("Frame analysis worker died") from e
+        finally:
+            if slot is not None:
+                ring.release(slot)
+        on_result(*result)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Compare the face backends on the same clips
+
+Usage:
+    python benchmark_face_backends.py --target person.jpg --positive clip1.mp4 clip2.mp4 \
+        --negative empty_street.mp4 [--backends hog cnn yunet] [--sample-rate 2]
+
+Every backend sees exactly the same sampled frames. Faces are located and
+encoded and scored against the target photo(s). The report covers:
+- throughput: sampled frames and faces per second of detection and encoding
+  time, excluding video decoding
+- recall: share of positive clips (the target appears) where the target was
+  found above the match threshold
+- false alarms: share of negative clips (the target never appears) where it
+  was found anyway
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from app.face_backends import FACE_BACKENDS, create_face_backend
+from app.face_cache import ENCODING_SIZE
+from app.frame_sources import FrameSampler
+from app.vision_engine import FACE_CONFIDENCE_THRESHOLD, FACE_MATCH_TOLERANCE, face_distance_matrix
+from config import Config
+
+
+def encode_targets(backend, paths):
+    encodings = []
+    for path in paths:
+        image = cv2.imread(path)
+        if image is None:
+            print(f"⚠️  Could not read target photo {path}")
+            continue
+        encodings.extend(backend.encode(image, backend.locate(image)))
+    return np.asarray(encodings, dtype=np.float64).reshape(-1, ENCODING_SIZE)
+
+
+def scan_clip(backend, path, targets, sample_rate):
+    """Return (frames, faces, seconds spent in the backend, best confidence) for one clip"""
+    cap = cv2.VideoCapture(path)
+    frames, faces, elapsed, best = 0, 0, 0.0, 0.0
+    try:
+        for _, frame in FrameSampler(cap, sample_rate):
+            started = time.perf_counter()
+            encodings = backend.encode(frame, backend.locate(frame))
+            elapsed += time.perf_counter() - started
+            frames += 1
+            faces += len(encodings)
+            if len(encodings) and len(targets):
+                distance = float(face_distance_matrix(encodings, targets).min())
+                if distance <= FACE_MATCH_TOLERANCE:
+                    best = max(best, 1.0 - distance)
+    finally:
+        cap.release()
+    return frames, faces, elapsed, best
+
+
+def benchmark(name, args):
+    try:
+        backend = create_face_backend(name, Config.VISION_YUNET_MODEL, Config.VISION_SFACE_MODEL)
+    except Exception as e:
+        print(f"❌ {name}: unavailable ({e})")
+        return None
+
+    targets = encode_targets(backend, args.target)
+    if len(targets) == 0:
+        print(f"❌ {name}: no face found in the target photo(s)")
+        return None
+
+    totals = {"frames": 0, "faces": 0, "seconds": 0.0, "found": 0, "false_alarms": 0}
+    for label, clips in (("positive", args.positive), ("negative", args.negative or [])):
+        for path in clips:
+            frames, faces, elapsed, best = scan_clip(backend, path, targets, args.sample_rate)
+            found = best > args.threshold
+            totals["frames"] += frames
+            totals["faces"] += faces
+            totals["seconds"] += elapsed
+            if found and label == "positive":
+                totals["found"] += 1
+            elif found:
+                totals["false_alarms"] += 1
+            print(f"   {name:6} {label:8} {path}: {frames} frames, {faces} faces, best {best:.2f}")
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare face backend throughput and accuracy")
+    parser.add_argument("--target", nargs="+", required=True, help="photo(s) of the person to look for")
+    parser.add_argument("--positive", nargs="+", required=True, help="clips in which the person appears")
+    parser.add_argument("--negative", nargs="*", help="clips in which the person does not appear")
+    parser.add_argument("--backends", nargs="+", default=list(FACE_BACKENDS), choices=FACE_BACKENDS)
+    parser.add_argument("--sample-rate", type=float, default=Config.VISION_SAMPLE_RATE, help="frames per second")
+    parser.add_argument("--threshold", type=float, default=FACE_CONFIDENCE_THRESHOLD, help="match confidence")
+    args = parser.parse_args()
+
+    print("🔄 Benchmarking face backends...")
+    results = {name: benchmark(name, args) for name in args.backends}
+
+    print()
+    print(f"{'backend':8} {'frames/s':>9} {'faces/s':>8} {'recall':>7} {'false alarms':>13}")
+    for name, totals in results.items():
+        if totals is None:
+            continue
+        seconds = totals["seconds"] or float("nan")
+        recall = totals["found"] / len(args.positive)
+        false_alarms = f"{totals['false_alarms'] / len(args.negative):.0%}" if args.negative else "-"
+        print(
+            f"{name:8} {totals['frames'] / seconds:9.1f} {totals['faces'] / seconds:8.1f} "
+            f"{recall:7.0%} {false_alarms:>13}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -30,6 +30,50 @@ class Config:
     ALLOWED_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'}
     ALLOWED_VIDEO_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'wmv', 'flv', 'webm'}
     FILE_UPLOAD_TIMEOUT = 300  # 5 minutes timeout for uploads
+
+    # Video analysis settings
+    VISION_WORKERS = int(os.environ.get("VISION_WORKERS", 0))  # 0 or 1 = analyze frames in the task process
+    VISION_QUEUE_DEPTH = int(os.environ.get("VISION_QUEUE_DEPTH", 16))  # max sampled frames in flight
+    VISION_SAMPLE_RATE = float(os.environ.get("VISION_SAMPLE_RATE", 2.0))  # analyzed frames per second of footage
+    VISION_MOTION_GATE = os.environ.get("VISION_MOTION_GATE", "true").lower() == "true"  # skip frames with no motion
+    VISION_MOTION_MIN_AREA = float(os.environ.get("VISION_MOTION_MIN_AREA", 0.002))  # fraction of the frame that must move
+    VISION_TRACKING = os.environ.get("VISION_TRACKING", "true").lower() == "true"  # one sighting per tracked person
+    VISION_TRACK_IOU = float(os.environ.get("VISION_TRACK_IOU", 0.3))  # min box overlap to continue a track
+    VISION_TRACK_MAX_GAP = float(os.environ.get("VISION_TRACK_MAX_GAP", 2.0))  # seconds unseen before a track ends
+    VISION_TRACK_QUALITY_GAIN = float(os.environ.get("VISION_TRACK_QUALITY_GAIN", 1.2))  # re-encode when face quality improves by this factor
+    VISION_EVENT_MAX_GAP = float(os.environ.get("VISION_EVENT_MAX_GAP", 5.0))  # seconds between matches merged into one sighting
+    VISION_SIGHTING_BATCH_SIZE = int(os.environ.get("VISION_SIGHTING_BATCH_SIZE", 50))  # sightings per bulk insert
+    VISION_SIGHTING_FLUSH_INTERVAL = float(os.environ.get("VISION_SIGHTING_FLUSH_INTERVAL", 10.0))  # max seconds a sighting waits
+    VISION_CHUNK_FRAMES = int(os.environ.get("VISION_CHUNK_FRAMES", 27000))  # source frames per segment of a long video
+    VISION_CHUNK_MIN_SECONDS = float(os.environ.get("VISION_CHUNK_MIN_SECONDS", 120.0))  # never split into segments shorter than this
+    VISION_CHUNK_OVERLAP = float(os.environ.get("VISION_CHUNK_OVERLAP", 10.0))  # seconds each segment re-reads before its start
+    VISION_CHECKPOINT_INTERVAL = float(os.environ.get("VISION_CHECKPOINT_INTERVAL", 60.0))  # seconds between resume checkpoints (0 = off)
+    VISION_FACE_ARCHIVE = os.environ.get("VISION_FACE_ARCHIVE", "true").lower() == "true"  # keep every face encoding per video
+    VISION_ARCHIVE_FOLDER = os.environ.get("VISION_ARCHIVE_FOLDER", os.path.join(basedir, "face_archives"))  # per-video face encodings for rescoring
+    VISION_INDEX_FOLDER = os.environ.get("VISION_INDEX_FOLDER", os.path.join(basedir, "face_index"))  # cross-case face search index
+    VISION_INDEX_LISTS = int(os.environ.get("VISION_INDEX_LISTS", 256))  # k-means lists of the index
+    VISION_INDEX_NPROBE = int(os.environ.get("VISION_INDEX_NPROBE", 8))  # lists scanned per query (recall vs speed)
+    VISION_DUPLICATE_MAX_DISTANCE = float(os.environ.get("VISION_DUPLICATE_MAX_DISTANCE", 6.0))  # fingerprint bits per frame for "same footage"
+    VISION_FACE_BACKEND = os.environ.get("VISION_FACE_BACKEND", "hog")  # hog, cnn or yunet; the AI settings page overrides it
+    VISION_YUNET_MODEL = os.environ.get("VISION_YUNET_MODEL", os.path.join(basedir, "models", "face_detection_yunet_2023mar.onnx"))
+    VISION_SFACE_MODEL = os.environ.get("VISION_SFACE_MODEL", os.path.join(basedir, "models", "face_recognition_sface_2021dec.onnx"))
+    VISION_HOG_PROFILE = os.environ.get("VISION_HOG_PROFILE", "thorough")  # fast, balanced or thorough person detection
+    VISION_HOG_PROFILE_CRITICAL = os.environ.get("VISION_HOG_PROFILE_CRITICAL", "fast")  # default for Critical-priority cases
+    VISION_FRAME_SOURCE = os.environ.get("VISION_FRAME_SOURCE", "opencv")  # opencv or ffmpeg (decode + downscale in a subprocess)
+    VISION_DECODE_MAX_HEIGHT = int(os.environ.get("VISION_DECODE_MAX_HEIGHT", 720))  # ffmpeg source: frames taller than this are scaled down
+    VISION_FFMPEG_BINARY = os.environ.get("VISION_FFMPEG_BINARY", "ffmpeg")
+    VISION_TWO_PASS = os.environ.get("VISION_TWO_PASS", "false").lower() == "true"  # sparse scan, then dense around people
+    VISION_COARSE_SAMPLE_RATE = float(os.environ.get("VISION_COARSE_SAMPLE_RATE", 0.5))  # first-pass frames per second
+    VISION_REFINE_MARGIN = float(os.environ.get("VISION_REFINE_MARGIN", 2.0))  # seconds added around each flagged frame
+    VISION_FACE_MIN_SIZE = int(os.environ.get("VISION_FACE_MIN_SIZE", 40))  # faces narrower than this (px) are not encoded
+    VISION_FACE_MIN_SHARPNESS = float(os.environ.get("VISION_FACE_MIN_SHARPNESS", 30.0))  # Laplacian variance of the face at 64x64
+    VISION_FACE_MAX_YAW = float(os.environ.get("VISION_FACE_MAX_YAW", 0.4))  # nose offset in eye distances; ~0.35 is a 45 degree turn
+    VISION_TRACK_ENCODE_WINDOW = float(os.environ.get("VISION_TRACK_ENCODE_WINDOW", 1.0))  # seconds between re-encodings of a track
+    VISION_CLOTHING_MIN_SCORE = float(os.environ.get("VISION_CLOTHING_MIN_SCORE", 0.0))  # 0 = no clothing pre-filter
+    VISION_FACE_MODE = os.environ.get("VISION_FACE_MODE", "roi")  # roi = per person box, frame = once per frame
+    VISION_FACE_DOWNSCALE = float(os.environ.get("VISION_FACE_DOWNSCALE", 0.5))  # frame mode face detection scale
+    VISION_TARGET_MAX_SIDE = int(os.environ.get("VISION_TARGET_MAX_SIDE", 1024))  # target photos are downscaled to this before encoding
+    VISION_SEEK_MIN_GAP = int(os.environ.get("VISION_SEEK_MIN_GAP", 300))  # seek instead of grab() across gaps this long (frames, 0 = never)
     
     # Security Settings
     WTF_CSRF_ENABLED = True
@@ -8,6 +8,19 @@ from app import create_app, db
 from app.models import User, AdminMessage, Announcement, BlogPost, FAQ, AISettings
 from sqlalchemy import text
 
+def add_missing_columns(inspector, table, columns):
+    """Add each (name, DDL type) column that the table does not have yet"""
+    existing = [col['name'] for col in inspector.get_columns(table)]
+    for name, ddl in columns:
+        if name in existing:
+            continue
+        try:
+            db.engine.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {name} {ddl}'))
+            print(f"✅ Added column: {table}.{name}")
+        except Exception as e:
+            print(f"⚠️  Column might already exist: {table}.{name}")
+
+
 def migrate_database():
     app = create_app()
     with app.app_context():
@@ -45,6 +58,45 @@ def migrate_database():
                 except Exception as e:
                     print(f"⚠️  Column might already exist: {column}")
             
+            # Upload-time analysis and face-encoding cache on target images
+            add_missing_columns(inspector, 'target_image', [
+                ('normalized_path', 'VARCHAR(200)'),
+                ('face_locations', 'TEXT'),
+                ('face_count', 'INTEGER'),
+                ('encoding_cache', 'BLOB'),
+                ('encoding_key', 'VARCHAR(128)'),
+                ('clothing_histogram', 'BLOB'),
+            ])
+            
+            # Per-video processing counters
+            add_missing_columns(inspector, 'search_video', [
+                ('analysis_stats', 'TEXT'),
+            ])
+            
+            # Incremental reprocessing bookkeeping
+            add_missing_columns(inspector, 'search_video', [
+                ('detection_signature', 'VARCHAR(64)'),
+                ('match_signature', 'VARCHAR(64)'),
+            ])
+            
+            # Per-case person detector profile
+            add_missing_columns(inspector, 'case', [
+                ('detection_profile', 'VARCHAR(20)'),
+            ])
+            
+            # Duplicate footage detection
+            add_missing_columns(inspector, 'search_video', [
+                ('content_hash', 'VARCHAR(64)'),
+                ('fingerprint', 'VARCHAR(128)'),
+                ('source_video_id', 'INTEGER REFERENCES search_video(id)'),
+            ])
+            
+            # Sighting events
+            add_missing_columns(inspector, 'sighting', [
+                ('end_timestamp', 'FLOAT'),
+                ('frame_scores', 'BLOB'),
+            ])
+            
             # Update existing users to have default values
             db.engine.execute(text("""
                 UPDATE user 
@@ -0,0 +1,40 @@
+"""
+Shared fixtures: an app on a throwaway SQLite database using the colour face backend of helpers.py
+"""
+import pytest
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    from helpers import ColourFaceBackend
+
+    from app import create_app, db
+    from config import Config
+
+    # Video paths are stored relative to the "app" folder of the working directory
+    monkeypatch.chdir(tmp_path)
+    upload_folder = tmp_path / "app" / "static" / "uploads"
+    upload_folder.mkdir(parents=True)
+
+    class TestConfig(Config):
+        TESTING = True
+        WTF_CSRF_ENABLED = False
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+        UPLOAD_FOLDER = str(upload_folder)
+        VISION_ARCHIVE_FOLDER = str(tmp_path / "face_archives")
+        VISION_INDEX_FOLDER = str(tmp_path / "face_index")
+        VISION_FRAME_SOURCE = "opencv"
+        VISION_MOTION_GATE = False
+        # Squares have no body for HOG to find: faces are located frame-wide
+        VISION_FACE_MODE = "frame"
+        VISION_FACE_MIN_SHARPNESS = 0.0
+        VISION_CHECKPOINT_INTERVAL = 0.0
+
+    # Module attribute, so worker processes forked by the pipeline use it too
+    monkeypatch.setattr("app.face_backends.create_face_backend", lambda **settings: ColourFaceBackend())
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
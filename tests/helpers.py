@@ -0,0 +1,113 @@
+"""
+Test helpers: a face backend that recognizes coloured squares, generated
+clips of them and cases looking for them, so analysis results are known in
+advance
+"""
+import os
+
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+pytest.importorskip("flask_sqlalchemy")
+
+from app import db
+from app.face_backends import FaceBackend
+from app.face_cache import ENCODING_SIZE, encoding_model_version, file_sha256, pack_encodings
+from app.models import Case, SearchVideo, TargetImage, User
+
+FPS = 10
+FRAME_SIZE = (320, 240)
+RED, GREEN, BLUE = (0, 0, 255), (0, 255, 0), (255, 0, 0)
+
+
+def colour_encoding(bgr):
+    """Encoding of a face of colour ``bgr``; faces of different primaries are ~1.4 apart, beyond the 0.6 tolerance"""
+    encoding = np.zeros(ENCODING_SIZE)
+    encoding[:3] = np.asarray(bgr, dtype=np.float64) / 255.0
+    return encoding
+
+
+class ColourFaceBackend(FaceBackend):
+    """A "face" is a saturated square of at least MIN_SIDE pixels; it is encoded by its mean colour"""
+
+    name = "colour"
+    MIN_SIDE = 20
+
+    @property
+    def version(self):
+        return "colour-test-1"
+
+    def locate(self, image, scale=1.0):
+        saturated = (image.max(axis=2).astype(int) - image.min(axis=2) > 100).astype(np.uint8)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(saturated)
+        return [
+            (int(y), int(x + w), int(y + h), int(x))
+            for x, y, w, h, _ in stats[1:count]
+            if min(w, h) >= self.MIN_SIDE
+        ]
+
+    def landmarks(self, image, locations):
+        # Always frontal
+        return [
+            {
+                "left_eye": (left + 0.3 * (right - left), top + 0.4 * (bottom - top)),
+                "right_eye": (left + 0.7 * (right - left), top + 0.4 * (bottom - top)),
+                "nose": ((left + right) / 2, top + 0.6 * (bottom - top)),
+            }
+            for top, right, bottom, left in locations
+        ]
+
+    def encode(self, image, locations):
+        return [
+            colour_encoding(image[top:bottom, left:right].reshape(-1, 3).mean(axis=0))
+            for top, right, bottom, left in locations
+        ]
+
+
+def write_clip(path, appearances, seconds=6):
+    """
+    Write an MJPG clip of ``seconds`` on a grey background. ``appearances``
+    are ``(colour, start, end, x)``: a 60 pixel square of ``colour`` at
+    column ``x`` from ``start`` to ``end`` seconds.
+    """
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), FPS, FRAME_SIZE)
+    for i in range(seconds * FPS):
+        frame = np.full((FRAME_SIZE[1], FRAME_SIZE[0], 3), 90, dtype=np.uint8)
+        for colour, start, end, x in appearances:
+            if start <= i / FPS < end:
+                cv2.rectangle(frame, (x, 60), (x + 59, 119), colour, -1)
+        writer.write(frame)
+    writer.release()
+
+
+def create_case(name, colour, video_name=None, appearances=(), user=None, seconds=6):
+    """A case looking for a ``colour`` face, optionally with a generated search video"""
+    if user is None:
+        user = User.query.filter_by(username="reporter").first()
+    if user is None:
+        user = User(username="reporter", email="reporter@example.com", password_hash="x")
+        db.session.add(user)
+        db.session.flush()
+    case = Case(person_name=name, user_id=user.id)
+    db.session.add(case)
+    db.session.flush()
+
+    photo = f"target_{case.id}.jpg"
+    photo_path = os.path.join("app", "static", "uploads", photo)
+    cv2.imwrite(photo_path, np.full((64, 64, 3), colour, dtype=np.uint8))
+    db.session.add(TargetImage(
+        case_id=case.id,
+        image_path=f"static/uploads/{photo}",
+        image_type="side",
+        encoding_cache=pack_encodings([colour_encoding(colour)]),
+        encoding_key=f"{file_sha256(photo_path)}:{encoding_model_version(ColourFaceBackend())}",
+    ))
+
+    video = None
+    if video_name is not None:
+        write_clip(os.path.join("app", "static", "uploads", video_name), appearances, seconds)
+        video = SearchVideo(case_id=case.id, video_path=f"static/uploads/{video_name}", video_name=video_name)
+        db.session.add(video)
+    db.session.commit()
+    return case, video
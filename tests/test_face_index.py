@@ -0,0 +1,69 @@
+"""
+FaceIndex: videos are added, found, hidden on delete and purged on compact
+"""
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("flask_sqlalchemy")
+
+from app.face_cache import ENCODING_SIZE
+from app.face_index import FaceIndex
+
+
+def faces(seed, count=100):
+    """``count`` encodings of one person: scattered around their own point"""
+    rng = np.random.default_rng(seed)
+    centre = rng.normal(0.0, 0.5, ENCODING_SIZE)
+    return centre + rng.normal(0.0, 0.02, (count, ENCODING_SIZE))
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = FaceIndex(str(tmp_path / "index"), nlist=4)
+    index.add(1, faces(1))
+    index.add(2, faces(2))
+    return index
+
+
+def test_query_finds_the_video_and_row_of_a_face(index):
+    (hits,) = index.query(faces(2)[[17]], k=3, nprobe=1)
+
+    assert hits[0][:2] == (2, 17)
+    assert hits[0][2] == pytest.approx(0.0, abs=0.05)
+    assert all(video_id == 2 for video_id, _, _ in hits)
+
+
+def test_query_respects_max_distance(index):
+    stranger = faces(3)[:1]
+
+    assert index.query(stranger, k=5, nprobe=4, max_distance=0.5) == [[]]
+    assert len(index.query(stranger, k=5, nprobe=4)[0]) == 5
+
+
+def test_readding_a_video_replaces_its_entries(index):
+    index.add(1, faces(1)[:10])
+
+    assert index.video_ids == [1, 2]
+    (hits,) = index.query(faces(1)[:1], k=50, nprobe=4, max_distance=0.5)
+    assert sorted(row for _, row, _ in hits) == list(range(10))
+
+
+def test_deleted_video_is_hidden_until_compacted(index):
+    size = sum(os.path.getsize(index._list_path(n)) for n in range(4) if os.path.exists(index._list_path(n)))
+    index.delete(1)
+
+    assert index.video_ids == [2]
+    assert index.query(faces(1)[:1], k=5, nprobe=4, max_distance=0.5) == [[]]
+    assert index.compact() == 1
+    assert index.compact() == 0
+    compacted = sum(os.path.getsize(index._list_path(n)) for n in range(4) if os.path.exists(index._list_path(n)))
+    assert compacted == size // 2
+
+
+def test_empty_index_answers_every_query(tmp_path):
+    index = FaceIndex(str(tmp_path / "index"), nlist=4)
+
+    assert index.query(faces(1)[:2]) == [[], []]
+    assert not index.needs_training
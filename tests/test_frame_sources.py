@@ -0,0 +1,69 @@
+"""
+Frame sources: FFmpegFrameSource must hand over the same frames as FrameSampler, and long videos split evenly
+"""
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+
+from app.frame_sources import FFmpegFrameSource, FrameSampler, ffmpeg_available, plan_segments
+
+FPS = 25
+LEVEL_STEP = 7  # grey level added per frame, so a one-frame skew is visible
+
+
+def write_numbered_video(path, frames=100, size=(160, 120)):
+    """Frame i is a flat grey of level (i * LEVEL_STEP) % 252"""
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), FPS, size)
+    for i in range(frames):
+        writer.write(np.full((size[1], size[0], 3), (i * LEVEL_STEP) % 252, dtype=np.uint8))
+    writer.release()
+
+
+def sample_opencv(path, **kwargs):
+    cap = cv2.VideoCapture(str(path))
+    try:
+        return [(number, frame.copy()) for number, frame in FrameSampler(cap, **kwargs)]
+    finally:
+        cap.release()
+
+
+@pytest.mark.skipif(not ffmpeg_available(), reason="ffmpeg is not installed")
+@pytest.mark.parametrize(
+    "sample_rate, start_time, end_time",
+    [(2.0, 0.0, None), (3.0, 0.0, None), (2.0, 1.3, None), (2.0, 0.5, 2.9), (25.0, 0.0, 1.0)],
+)
+def test_ffmpeg_frames_match_frame_sampler(tmp_path, sample_rate, start_time, end_time):
+    path = tmp_path / "numbered.avi"
+    write_numbered_video(path)
+
+    expected = sample_opencv(path, sample_rate=sample_rate, start_time=start_time, end_time=end_time)
+    source = FFmpegFrameSource(
+        str(path), FPS, 160, 120, sample_rate, start_time=start_time, end_time=end_time, reuse_buffer=False
+    )
+    actual = list(source)
+
+    assert [number for number, _ in actual] == [number for number, _ in expected]
+    for (number, frame), (_, reference) in zip(actual, expected):
+        difference = np.abs(frame.astype(int) - reference.astype(int)).mean()
+        assert difference < LEVEL_STEP / 2, f"frame {number} shows different pixels"
+
+
+def test_short_or_unknown_videos_are_not_split():
+    assert plan_segments(300.0, 25.0, chunk_frames=27000) == [(0.0, None)]
+    assert plan_segments(None, 25.0, chunk_frames=100) == [(0.0, None)]
+    assert plan_segments(3600.0, 0.0, chunk_frames=100) == [(0.0, None)]
+
+
+def test_segments_cover_the_video_with_overlap():
+    segments = plan_segments(3600.0, 25.0, chunk_frames=27000, overlap=10.0)
+
+    # 27000 frames at 25 fps is 1080 s, so an hour splits into four even 900 s segments
+    assert segments == [(0.0, 900.0), (890.0, 1800.0), (1790.0, 2700.0), (2690.0, None)]
+
+
+def test_segment_length_follows_the_frame_rate():
+    assert len(plan_segments(3600.0, 60.0, chunk_frames=27000)) == 8
+    assert len(plan_segments(3600.0, 10.0, chunk_frames=27000)) == 2
+    # Never shorter than min_seconds, however high the frame rate
+    assert len(plan_segments(600.0, 1000.0, chunk_frames=1000, min_seconds=120.0)) == 5
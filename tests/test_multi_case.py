@@ -0,0 +1,74 @@
+"""
+MultiCaseProcessor: one decode, sightings per case on each case's own video
+"""
+import pytest
+
+from helpers import BLUE, GREEN, RED, create_case
+
+from app import db
+from app.models import Case, SearchVideo, Sighting, User
+
+
+def shared_run(app, workers):
+    from app.multi_case import MultiCaseProcessor
+
+    app.config["VISION_WORKERS"] = workers
+    # A red person for the first two seconds, a blue one from the third
+    red, footage = create_case("Red", RED, "shared.avi", [(RED, 0.0, 2.0, 40), (BLUE, 3.0, 5.0, 200)])
+    blue, _ = create_case("Blue", BLUE)
+    green, _ = create_case("Green", GREEN)
+    results = MultiCaseProcessor([red.id, blue.id, green.id]).run_video(footage)
+    return footage, red, blue, green, results
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_each_case_gets_its_own_sightings_and_video(app, workers):
+    footage, red, blue, green, results = shared_run(app, workers)
+
+    assert results[red.id]["sightings"] == 1
+    assert results[blue.id]["sightings"] == 1
+    assert results[green.id]["sightings"] == 0
+
+    for case in (red, blue, green):
+        videos = SearchVideo.query.filter_by(case_id=case.id).all()
+        assert len(videos) == 1
+        assert videos[0].status == "Completed"
+        for sighting in Sighting.query.filter_by(case_id=case.id):
+            assert sighting.search_video_id == videos[0].id
+
+    red_sighting = Sighting.query.filter_by(case_id=red.id).one()
+    blue_sighting = Sighting.query.filter_by(case_id=blue.id).one()
+    assert red_sighting.search_video_id == footage.id
+    assert red_sighting.timestamp < 2.0
+    assert blue_sighting.timestamp >= 3.0
+    assert SearchVideo.query.get(blue_sighting.search_video_id).source_video_id == footage.id
+
+
+def test_searched_cases_are_not_matched_again(app):
+    from app.reprocessing import searched_case_ids
+
+    footage, red, blue, green, _ = shared_run(app, 0)
+    # Green had no hits but was searched all the same
+    assert searched_case_ids(footage) == {red.id, blue.id, green.id}
+
+
+def test_deleting_the_source_case_keeps_the_other_cases_results(app, monkeypatch):
+    footage, red, blue, green, _ = shared_run(app, 0)
+    monkeypatch.setattr("app.tasks.index_video_faces.delay", lambda video_id: None)
+
+    admin = User(username="admin", email="admin@example.com", password_hash="x", is_admin=True)
+    db.session.add(admin)
+    db.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(admin.id)
+        session["_fresh"] = True
+
+    response = client.post(f"/admin/cases/{red.id}/delete")
+    assert response.status_code == 302
+
+    db.session.expire_all()
+    assert Case.query.get(red.id) is None
+    blue_video = SearchVideo.query.filter_by(case_id=blue.id).one()
+    assert blue_video.source_video_id is None
+    assert Sighting.query.filter_by(case_id=blue.id).one().search_video_id == blue_video.id
@@ -0,0 +1,31 @@
+"""
+FramePipeline: analysis in worker processes must write the same sightings as in-process analysis
+"""
+from helpers import GREEN, RED, create_case
+
+from app.models import Sighting
+from app.vision_engine import VisionProcessor
+
+# Red twice, far enough apart to be two sightings, with a green stranger in
+# between who starts after red's track has ended, so no confidence carries over
+APPEARANCES = [(RED, 0.0, 2.0, 20), (GREEN, 4.5, 6.5, 240), (RED, 9.0, 11.0, 200)]
+
+
+def analyze(app, name, workers):
+    app.config["VISION_WORKERS"] = workers
+    case, video = create_case(name, RED, f"{name}.avi", APPEARANCES, seconds=12)
+    VisionProcessor(case.id).run_analysis()
+    assert video.status == "Completed"
+    return [
+        (s.timestamp, s.end_timestamp, round(s.confidence_score, 6), s.bounding_box, s.detection_method, s.frame_scores)
+        for s in Sighting.query.filter_by(case_id=case.id).order_by(Sighting.timestamp)
+    ]
+
+
+def test_worker_processes_write_the_same_sightings(app):
+    in_process = analyze(app, "in_process", 0)
+    pooled = analyze(app, "pooled", 2)
+
+    assert len(in_process) == 2
+    assert in_process[0][0] < 2.0 and in_process[1][0] >= 9.0
+    assert pooled == in_process
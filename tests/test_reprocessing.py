@@ -0,0 +1,66 @@
+"""
+plan_video: what a video needs when a case is processed again
+"""
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("flask_sqlalchemy")
+
+from app.face_archive import face_archive_path
+from app.reprocessing import plan_video
+
+DETECTION, MATCH = "detection-v1", "match-v1"
+
+
+def video(video_id=1, status="Completed", detection=DETECTION, match=MATCH, source=None):
+    return SimpleNamespace(
+        id=video_id, status=status, detection_signature=detection, match_signature=match, source_video=source
+    )
+
+
+@pytest.fixture
+def archive_folder(tmp_path):
+    return str(tmp_path)
+
+
+def archive(folder, video_id):
+    with open(face_archive_path(folder, video_id), "wb"):
+        pass
+
+
+def test_unchanged_completed_video_is_skipped(archive_folder):
+    assert plan_video(video(), DETECTION, MATCH, archive_folder) == "skip"
+
+
+def test_new_targets_rescore_the_archive(archive_folder):
+    archive(archive_folder, 1)
+
+    assert plan_video(video(), DETECTION, "match-v2", archive_folder) == "rescore"
+
+
+def test_missing_archive_means_a_full_analysis(archive_folder):
+    assert plan_video(video(), DETECTION, "match-v2", archive_folder) == "analyze"
+
+
+def test_new_detection_settings_mean_a_full_analysis(archive_folder):
+    archive(archive_folder, 1)
+
+    assert plan_video(video(), "detection-v2", MATCH, archive_folder) == "analyze"
+
+
+def test_interrupted_analysis_resumes(archive_folder):
+    assert plan_video(video(status="Processing"), DETECTION, MATCH, archive_folder) == "resume"
+    assert plan_video(video(status="Processing", match="match-v0"), DETECTION, MATCH, archive_folder) == "analyze"
+
+
+def test_duplicate_rescores_its_sources_archive(archive_folder):
+    source = video(video_id=1)
+    duplicate = video(video_id=2, status="Pending", detection=None, match=None, source=source)
+
+    assert plan_video(duplicate, DETECTION, MATCH, archive_folder) == "analyze"
+    archive(archive_folder, 1)
+    assert plan_video(duplicate, DETECTION, MATCH, archive_folder) == "rescore"
+    source.detection_signature = "detection-v0"
+    assert plan_video(duplicate, DETECTION, MATCH, archive_folder) == "analyze"
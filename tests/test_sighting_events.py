@@ -0,0 +1,59 @@
+"""
+merge_adjacent_sightings: rows split at a segment boundary become one sighting
+"""
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("flask_sqlalchemy")
+
+from app.sighting_events import merge_adjacent_sightings, pack_frame_scores, unpack_frame_scores
+
+
+def sighting(matches, end=True):
+    confidences = [confidence for _, confidence in matches]
+    return SimpleNamespace(
+        timestamp=matches[0][0],
+        end_timestamp=matches[-1][0] if end else None,
+        confidence_score=max(confidences),
+        frame_scores=pack_frame_scores(matches),
+    )
+
+
+def test_overlapping_rows_merge_into_the_stronger_one():
+    first = sighting([(10.0, 0.7), (11.0, 0.8), (12.0, 0.6)])
+    second = sighting([(11.0, 0.75), (12.0, 0.9), (13.0, 0.5)])
+
+    removed = merge_adjacent_sightings([first, second], max_gap=5.0)
+
+    assert removed == [first]
+    assert (second.timestamp, second.end_timestamp) == (10.0, 13.0)
+    # Frames both rows scored appear once, with the higher score
+    assert unpack_frame_scores(second.frame_scores).tolist() == [
+        [10.0, pytest.approx(0.7)], [11.0, pytest.approx(0.8)], [12.0, pytest.approx(0.9)], [13.0, pytest.approx(0.5)],
+    ]
+
+
+def test_rows_within_max_gap_merge_in_a_chain():
+    rows = [sighting([(0.0, 0.6), (1.0, 0.7)]), sighting([(4.0, 0.9)]), sighting([(8.0, 0.5), (9.0, 0.6)])]
+
+    removed = merge_adjacent_sightings(rows, max_gap=5.0)
+
+    assert removed == [rows[0], rows[2]]
+    assert (rows[1].timestamp, rows[1].end_timestamp) == (0.0, 9.0)
+    assert len(unpack_frame_scores(rows[1].frame_scores)) == 5
+
+
+def test_rows_further_apart_than_max_gap_are_kept():
+    rows = [sighting([(0.0, 0.6), (1.0, 0.7)]), sighting([(7.0, 0.9)])]
+
+    assert merge_adjacent_sightings(rows, max_gap=5.0) == []
+    assert (rows[0].end_timestamp, rows[1].timestamp) == (1.0, 7.0)
+
+
+def test_row_without_end_is_measured_from_its_start():
+    rows = [sighting([(0.0, 0.8)], end=False), sighting([(4.0, 0.6)])]
+
+    assert merge_adjacent_sightings(rows, max_gap=5.0) == [rows[1]]
+    assert (rows[0].timestamp, rows[0].end_timestamp) == (0.0, 4.0)
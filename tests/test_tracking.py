@@ -0,0 +1,59 @@
+"""
+PersonTracker: boxes keep their track between samples, new people start new tracks
+"""
+import pytest
+
+pytest.importorskip("flask_sqlalchemy")
+
+from app.tracking import PersonTracker
+
+
+def test_overlapping_box_continues_its_track():
+    tracker = PersonTracker()
+    (first,) = tracker.assign([(100, 100, 50, 100)], 0.0)
+    (second,) = tracker.assign([(110, 105, 50, 100)], 0.5)
+
+    assert second is first
+    assert first.box == (110, 105, 50, 100)
+    assert first.last_seen == 0.5
+    assert tracker.tracks_started == 1
+
+
+def test_fast_mover_is_matched_by_centroid():
+    tracker = PersonTracker()
+    (first,) = tracker.assign([(100, 100, 40, 80)], 0.0)
+    # No overlap, but the centre moved less than half a box diagonal
+    (second,) = tracker.assign([(142, 100, 40, 80)], 0.5)
+
+    assert second is first
+
+
+def test_distant_box_starts_a_new_track():
+    tracker = PersonTracker()
+    (first,) = tracker.assign([(0, 0, 40, 80)], 0.0)
+    (second,) = tracker.assign([(300, 0, 40, 80)], 0.5)
+
+    assert second is not first
+    assert tracker.tracks_started == 2
+
+
+def test_each_track_goes_to_one_box():
+    tracker = PersonTracker()
+    left, right = tracker.assign([(0, 0, 50, 100), (200, 0, 50, 100)], 0.0)
+    # Swapped order and slight moves: the best overlap wins for each box
+    new_right, new_left = tracker.assign([(205, 0, 50, 100), (5, 0, 50, 100)], 0.5)
+
+    assert new_left is left and new_right is right
+    assert len({id(t) for t in tracker.assign([(0, 0, 50, 100), (3, 0, 50, 100)], 1.0)}) == 2
+
+
+def test_tracks_unseen_for_max_gap_are_finished():
+    tracker = PersonTracker(max_gap=2.0)
+    stale, live = tracker.assign([(0, 0, 40, 80), (300, 0, 40, 80)], 0.0)
+    tracker.assign([(300, 0, 40, 80)], 2.0)
+
+    assert tracker.pop_finished(2.0) == []
+    assert tracker.pop_finished(2.5) == [stale]
+    assert tracker.get(stale.track_id) is None
+    assert tracker.pop_all() == [live]
+    assert tracker.tracks == {}